@@ -9,7 +9,12 @@ from intrigue.apt import models as apt_models, find
 logger = logging.getLogger(__name__)
 
 
-def repo_view_info(repo: apt_models.RepositorySourceEntry | None):
+LISTING_PAGE_SIZE = 200
+
+
+def repo_view_info(
+    repo: apt_models.RepositorySourceEntry | None, after: str | None = None
+):
     result = {"url": "", "view_context": {}}
     if not repo:
         return result
@@ -43,8 +48,16 @@ def repo_view_info(repo: apt_models.RepositorySourceEntry | None):
     result["view_context"]["repo_source_entry"] = repo
 
     client = settings.BACKEND_HTTP_CLIENT
-    result["view_context"]["html_listing"] = find.get_links(client, repo.url.url)
-    result["view_context"]["landmarks"] = find.detect_landmarks(repo)
+    # browse using the archive's ls-lR.gz listing when there is one
+    html_listing = find.get_tree_page(
+        client, repo.url.url, after=after, limit=LISTING_PAGE_SIZE
+    )
+    if html_listing is None:
+        html_listing = find.get_links_page(
+            client, repo.url.url, after=after, limit=LISTING_PAGE_SIZE
+        )
+    result["view_context"]["html_listing"] = html_listing
+    result["view_context"]["landmarks"] = find.probe_landmarks(client, repo)
 
     return result
 
@@ -0,0 +1,40 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from intrigue.apt import find, snapshot
+from intrigue.apt import operations as apt_operations
+
+
+class Command(BaseCommand):
+    help = "Crawl APT repositories again, requesting only what changed since the last crawl."
+
+    def add_arguments(self, parser):
+        parser.add_argument("url", help="The url of the APT archive repository.")
+        parser.add_argument(
+            "--distribution",
+            default=None,
+            help="The distributions to refresh, separated by spaces.",
+        )
+
+    def handle(self, *args, **options):
+        repo = apt_operations.parse_repository(
+            url=options["url"], distribution=options["distribution"]
+        )
+        if repo is None:
+            raise CommandError(f"Could not read the repository '{options['url']}'.")
+        store = snapshot.SnapshotStore(settings.CRAWL_SNAPSHOT_PATH)
+        crawler = find.RepositoryCrawler(settings.BACKEND_HTTP_CLIENT, repo)
+
+        for changes in crawler.refresh(store):
+            expired = " (expired)" if changes.is_expired else ""
+            if changes.is_unchanged:
+                self.stdout.write(f"{changes.dist}: unchanged{expired}")
+                continue
+            failed = [path for path, status in changes.fetched.items() if status != 200]
+            self.stdout.write(
+                f"{changes.dist}: {len(changes.changed)} changed, "
+                f"{len(changes.removed)} removed, "
+                f"{len(changes.fetched) - len(failed)} downloaded{expired}"
+            )
+            for path in failed:
+                self.stderr.write(f"  could not download {path}")
@@ -0,0 +1,59 @@
+import datetime
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+
+def _size(value: int) -> str:
+    for unit in ["B", "KiB", "MiB", "GiB"]:
+        if value < 1024 or unit == "GiB":
+            return f"{value:.1f} {unit}" if unit != "B" else f"{value} {unit}"
+        value /= 1024
+    return str(value)
+
+
+def _age(value: datetime.datetime | None, now: datetime.datetime) -> str:
+    if value is None:
+        return "-"
+    return str(now - value).split(".")[0]
+
+
+class Command(BaseCommand):
+    help = "Report on and compact the http response cache."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "action",
+            choices=["stats", "compact"],
+            help="Show the cache usage, or remove unused entries and reclaim space.",
+        )
+        parser.add_argument(
+            "--expired",
+            action="store_true",
+            help="When compacting, also remove expired responses.",
+        )
+
+    def handle(self, *args, **options):
+        store = settings.BACKEND_HTTP_CLIENT.cache_store
+
+        if options["action"] == "compact":
+            removed = store.compact(expired=options["expired"])
+            self.stdout.write(f"Removed {removed} cached responses.")
+
+        stats = store.stats()
+        now = datetime.datetime.now(datetime.UTC)
+        limit = _size(stats.max_bytes) if stats.max_bytes else "none"
+        self.stdout.write(
+            f"File size {_size(stats.file_size_bytes)}, "
+            f"{stats.entries} responses using {_size(stats.size_bytes)}, "
+            f"limit {limit}."
+        )
+        self.stdout.write(
+            f"{'host':<40} {'entries':>8} {'size':>12} {'last hit':>16} {'oldest hit':>16}"
+        )
+        for host in stats.hosts:
+            self.stdout.write(
+                f"{host.host or '(untracked)':<40} {host.entries:>8} "
+                f"{_size(host.size_bytes):>12} {_age(host.last_hit, now):>16} "
+                f"{_age(host.first_hit, now):>16}"
+            )
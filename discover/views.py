@@ -7,9 +7,9 @@ from intrigue.apt import operations as apt_operations
 from intrigue.apt.resource import AptRepoKnownNames
 
 
-def _to_repo(**kwargs):
+def _to_repo(after: str | None = None, **kwargs):
     repo = apt_operations.parse_repository(**kwargs)
-    return view_helper.repo_view_info(repo)
+    return view_helper.repo_view_info(repo, after=after)
 
 
 def _get_value(request, get_kwargs, name: str) -> str | None:
@@ -56,6 +56,7 @@ class RepositoryView(generic.TemplateView):
 
     def get(self, request, *args, **kwargs):
         view_info = _to_repo(
+            after=request.GET.get("after") or None,
             **{
                 "repository": _get_value(request, kwargs, "repository"),
                 "directory": _get_value(request, kwargs, "directory"),
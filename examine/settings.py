@@ -140,7 +140,18 @@ TASKS = {
 
 # Custom settings
 
-BACKEND_HTTP_CLIENT = HttpClient(cache_file=DATABASE_PATH)
+# The http response cache is kept apart from the Django database,
+# so its writes do not compete for the same locks.
+HTTP_CACHE_PATH = BASE_DIR / "http_cache.sqlite3"
+HTTP_CACHE_MAX_BYTES = 1024 * 1024 * 1024
+
+BACKEND_HTTP_CLIENT = HttpClient(
+    cache_file=HTTP_CACHE_PATH, cache_max_bytes=HTTP_CACHE_MAX_BYTES
+)
+
+# What was found the last time each repository was crawled,
+# so a refresh only requests what changed.
+CRAWL_SNAPSHOT_PATH = BASE_DIR / "crawl_snapshot.sqlite3"
 
 
 # Only enable the toolbar when we're in debug mode and we're
@@ -0,0 +1,276 @@
+"""Indexes the Contents files of an APT archive repository,
+which list the files shipped by each package."""
+
+import array
+import bisect
+import logging
+import mmap
+import os
+import pathlib
+import struct
+import tempfile
+import typing
+import zlib
+
+import attrs
+from beartype import beartype
+
+from intrigue.apt.utils import AptException
+
+logger = logging.getLogger(__name__)
+
+# the header of an index file: the format marker, then the number of records
+# and the offsets of the path keys, name keys and records sections.
+# Index files are a local cache, so numbers are stored in the native byte order.
+INDEX_MAGIC = b"APTCIDX1"
+INDEX_HEADER = struct.Struct("=8sQQQQ")
+# older Contents files have a description before this header line
+CONTENTS_HEADER = (b"FILE", b"LOCATION")
+# the number of lines to look through for the header
+CONTENTS_HEADER_LINES = 50
+
+
+@beartype
+@attrs.frozen
+class ContentsEntry:
+    """A file and the packages that ship it."""
+
+    path: str
+    """The path of the file, without a leading slash."""
+    locations: list[str]
+    """The packages that ship the file, prefixed by their section, e.g. 'utils/coreutils'."""
+
+    @property
+    def packages(self) -> list[str]:
+        """The names of the packages that ship the file."""
+        return [i.rsplit("/", maxsplit=1)[-1] for i in self.locations]
+
+
+@beartype
+def parse_line(line: bytes | str) -> ContentsEntry | None:
+    """Parse one line of a Contents file,
+    or return None if the line is not a file entry."""
+    pair = _split(line.encode("utf-8") if isinstance(line, str) else line)
+    return _entry(*pair) if pair is not None else None
+
+
+@beartype
+def iter_entries(
+    lines: typing.Iterable[bytes | str],
+) -> typing.Generator[ContentsEntry, None, None]:
+    """Read the entries of a Contents file one line at a time.
+    Older Contents files start with a description, which is skipped."""
+    for path, locations in _iter_pairs(lines):
+        yield _entry(path, locations)
+
+
+@beartype
+class ContentsIndex:
+    """An index from file paths and file names to the packages that ship them,
+    stored in a file on disk.
+
+    The index file contains the records, the offset of each record,
+    and two sorted arrays of keys, one for the full paths and one for the file names.
+    Each key is the crc32 of the path or name and the number of the record,
+    so a lookup is a binary search of the memory mapped file
+    and only the matching records are read.
+    """
+
+    def __init__(self, index_file: pathlib.Path):
+        self._index_file = index_file
+        with index_file.open("rb") as f:
+            self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+        magic, count, paths_start, names_start, records_start = (
+            INDEX_HEADER.unpack_from(self._mmap)
+        )
+        if magic != INDEX_MAGIC:
+            self._mmap.close()
+            raise AptException(f"Not a Contents index file '{index_file}'.")
+
+        self._view = memoryview(self._mmap)
+        self._count = count
+        self._offsets = self._view[INDEX_HEADER.size : paths_start].cast("Q")
+        self._path_keys = self._view[paths_start:names_start].cast("Q")
+        self._name_keys = self._view[names_start:records_start].cast("Q")
+        self._records = self._view[records_start:]
+
+    @classmethod
+    def build(
+        cls, lines: typing.Iterable[bytes | str], index_file: pathlib.Path
+    ) -> "ContentsIndex":
+        """Build an index file from the lines of a Contents file.
+
+        The records are written to a temporary file as they are read,
+        so only the offsets and keys are held in memory.
+        The index file is moved into place once it is complete."""
+        index_file.parent.mkdir(parents=True, exist_ok=True)
+        offsets = array.array("Q", [0])
+        path_keys = array.array("Q")
+        name_keys = array.array("Q")
+
+        with tempfile.TemporaryFile(dir=index_file.parent) as records:
+            for path, locations in _iter_pairs(lines):
+                index = len(path_keys)
+                record = b"%s\t%s\n" % (path, locations)
+                records.write(record)
+                offsets.append(offsets[-1] + len(record))
+                path_keys.append(_key(path, index))
+                name_keys.append(_key(path.rpartition(b"/")[2], index))
+
+            count = len(path_keys)
+            paths_start = INDEX_HEADER.size + offsets.itemsize * len(offsets)
+            names_start = paths_start + path_keys.itemsize * count
+            records_start = names_start + name_keys.itemsize * count
+            fd, temp_name = tempfile.mkstemp(dir=index_file.parent, suffix=".partial")
+            temp_path = pathlib.Path(temp_name)
+            try:
+                with os.fdopen(fd, "wb") as f:
+                    f.write(
+                        INDEX_HEADER.pack(
+                            INDEX_MAGIC, count, paths_start, names_start, records_start
+                        )
+                    )
+                    offsets.tofile(f)
+                    array.array("Q", sorted(path_keys)).tofile(f)
+                    array.array("Q", sorted(name_keys)).tofile(f)
+                    records.seek(0)
+                    while chunk := records.read(1024 * 1024):
+                        f.write(chunk)
+                os.replace(temp_path, index_file)
+            except BaseException:
+                temp_path.unlink(missing_ok=True)
+                raise
+
+        logger.info("Indexed %s files from Contents listing", count)
+        return cls(index_file)
+
+    def __len__(self) -> int:
+        return self._count
+
+    def __enter__(self) -> typing.Self:
+        return self
+
+    def __exit__(self, *args) -> None:
+        self.close()
+
+    def close(self) -> None:
+        for view in [
+            self._offsets,
+            self._path_keys,
+            self._name_keys,
+            self._records,
+            self._view,
+        ]:
+            view.release()
+        self._mmap.close()
+
+    def lookup(self, path: str) -> ContentsEntry | None:
+        """Get the packages that ship a file, such as 'usr/bin/ls' or '/usr/bin/ls'."""
+        path = path.strip().lstrip("/")
+        for entry in self._matches(self._path_keys, path):
+            if entry.path == path:
+                return entry
+        return None
+
+    def search_name(self, name: str) -> list[ContentsEntry]:
+        """Get the files with a file name, such as 'ls', and the packages that ship them."""
+        return sorted(
+            (
+                i
+                for i in self._matches(self._name_keys, name)
+                if i.path.rpartition("/")[2] == name
+            ),
+            key=lambda i: i.path,
+        )
+
+    def _matches(
+        self, keys: memoryview, value: str
+    ) -> typing.Generator[ContentsEntry, None, None]:
+        low = _key(value.encode("utf-8"), 0)
+        start = bisect.bisect_left(keys, low)
+        end = bisect.bisect_left(keys, low + (1 << 32), lo=start)
+        for position in range(start, end):
+            yield self._record(keys[position] & 0xFFFFFFFF)
+
+    def _record(self, index: int) -> ContentsEntry:
+        data = bytes(self._records[self._offsets[index] : self._offsets[index + 1]])
+        path, locations = (
+            data.decode("utf-8", "replace").rstrip("\n").split("\t", maxsplit=1)
+        )
+        return ContentsEntry(path=path, locations=locations.split(","))
+
+
+@beartype
+class ContentsIndexStore:
+    """Keeps the Contents index files, named by the hash of the Contents file,
+    so each Contents file is only indexed once."""
+
+    def __init__(self, root: pathlib.Path):
+        self._root = root
+
+    @property
+    def root(self) -> pathlib.Path:
+        return self._root
+
+    def path(self, digest: str) -> pathlib.Path:
+        if not digest or not digest.replace("-", "").isalnum():
+            raise AptException(f"Invalid Contents file hash '{digest}'.")
+        return self._root / f"{digest}.contents-index"
+
+    def open(self, digest: str) -> ContentsIndex | None:
+        """Open the index of a Contents file, or None if it has not been built."""
+        path = self.path(digest)
+        if not path.is_file():
+            return None
+        return ContentsIndex(path)
+
+    def build(self, digest: str, lines: typing.Iterable[bytes | str]) -> ContentsIndex:
+        """Build the index of a Contents file from its lines."""
+        return ContentsIndex.build(lines, self.path(digest))
+
+
+def _iter_pairs(
+    lines: typing.Iterable[bytes | str],
+) -> typing.Generator[tuple[bytes, bytes], None, None]:
+    # hold the first lines until the header is found,
+    # as the lines before the header are a description, not file entries
+    pending: list[tuple[bytes, bytes]] | None = []
+    for number, line in enumerate(lines):
+        pair = _split(line.encode("utf-8") if isinstance(line, str) else line)
+        if pending is None:
+            if pair is not None:
+                yield pair
+            continue
+
+        if pair == CONTENTS_HEADER:
+            pending = None
+            continue
+        if pair is not None:
+            pending.append(pair)
+        if number >= CONTENTS_HEADER_LINES:
+            yield from pending
+            pending = None
+    yield from pending or []
+
+
+def _split(line: bytes) -> tuple[bytes, bytes] | None:
+    # the path can contain spaces, the locations never do
+    parts = line.rstrip().rsplit(None, maxsplit=1)
+    if len(parts) != 2:
+        return None
+    path = parts[0].strip().lstrip(b"/")
+    if not path:
+        return None
+    return path, parts[1]
+
+
+def _entry(path: bytes, locations: bytes) -> ContentsEntry:
+    return ContentsEntry(
+        path=path.decode("utf-8", "replace"),
+        locations=[i for i in locations.decode("utf-8", "replace").split(",") if i],
+    )
+
+
+def _key(value: bytes, index: int) -> int:
+    return (zlib.crc32(value) << 32) | index
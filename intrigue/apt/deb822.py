@@ -0,0 +1,200 @@
+"""Reads control files (deb822 format) one paragraph at a time."""
+
+import io
+import logging
+import mmap
+import os
+import re
+import stat
+import typing
+
+from beartype import beartype
+
+from intrigue.apt import models as apt_models
+from intrigue.apt.utils import AptException
+
+logger = logging.getLogger(__name__)
+
+# a line containing only whitespace separates paragraphs
+RE_SEPARATOR: re.Pattern[bytes] = re.compile(rb"\n[ \t\r]*\n")
+# a field starts at the beginning of a line that is not a continuation or comment
+RE_FIELD: re.Pattern[bytes] = re.compile(rb"^([^\s:#][^:\s]*)[ \t]*:", re.MULTILINE)
+
+Source = bytes | bytearray | memoryview | mmap.mmap | io.IOBase
+
+
+@beartype
+class RawParagraph:
+    """A paragraph of a control file, kept as bytes.
+
+    Only the names of the fields are found when the paragraph is read.
+    The value of a field is decoded when it is used,
+    so reading a few fields of each paragraph in a large index is fast.
+    Field names are not case-sensitive.
+    A field that appears more than once keeps its first value.
+    """
+
+    __slots__ = ("_encoding", "_fields")
+
+    def __init__(self, data: bytes, encoding: str = "utf-8"):
+        self._encoding = encoding
+
+        # the leading text, then the name and value of each field
+        parts = RE_FIELD.split(data)
+        if parts[0]:
+            self._check_leading(parts[0])
+        names = parts[1::2]
+        self._fields = dict(zip(map(bytes.lower, names), zip(names, parts[2::2])))
+        if len(self._fields) != len(names):
+            # a repeated name would replace the earlier value
+            self._fields = {}
+            for name, value in zip(names, parts[2::2]):
+                self._fields.setdefault(name.lower(), (name, value))
+
+    def __len__(self) -> int:
+        return len(self._fields)
+
+    def __contains__(self, name: str) -> bool:
+        return name.lower().encode(self._encoding) in self._fields
+
+    @property
+    def names(self) -> list[str]:
+        """The field names, in the order they appear."""
+        return [name.decode(self._encoding) for name, _ in self._fields.values()]
+
+    def values(self, name: str) -> list[str] | None:
+        """Get the lines of a field's value, or None if the field is not present."""
+        item = self._fields.get(name.lower().encode(self._encoding))
+        if item is None:
+            return None
+        return self._decode(item[1])
+
+    def get(self, name: str, default: str | None = None) -> str | None:
+        """Get the first line of a field's value."""
+        item = self._fields.get(name.lower().encode(self._encoding))
+        if item is None:
+            return default
+        value = item[1].rstrip()
+        if b"\n" not in value:
+            return value.decode(self._encoding).strip()
+        return self._decode(value)[0]
+
+    def to_paragraph(self) -> apt_models.Paragraph:
+        """Decode all the fields into a Paragraph."""
+        fields = []
+        for name, raw_value in self._fields.values():
+            # most fields are one line
+            value = raw_value.rstrip()
+            if b"\n" in value:
+                values = self._decode(value)
+            else:
+                values = [value.decode(self._encoding).strip()]
+            fields.append(
+                apt_models.Field(name=name.decode(self._encoding), values=values)
+            )
+        return apt_models.Paragraph(fields=fields)
+
+    def _decode(self, value: bytes) -> list[str]:
+        first, *rest = value.rstrip().decode(self._encoding).split("\n")
+        result = [first.strip()]
+        for line in rest:
+            line = line.rstrip("\r")
+            if not line or line.startswith("#"):
+                continue
+            if line == line.lstrip():
+                raise AptException(f"Invalid paragraph line '{line}'.")
+            result.append(line.lstrip())
+        return result
+
+    def _check_leading(self, data: bytes) -> None:
+        # only comments can come before the first field
+        for line in data.splitlines():
+            if line.strip() and not line.startswith(b"#"):
+                raise AptException(
+                    f"Invalid paragraph line '{line.decode(self._encoding, 'replace')}'."
+                )
+
+
+@beartype
+def iter_paragraphs(
+    source: Source,
+    encoding: str = "utf-8",
+    chunk_size: int = 1024 * 1024,
+) -> typing.Generator[RawParagraph, None, None]:
+    """Read the paragraphs of a control file one at a time.
+
+    The source can be bytes, a memory map, or a binary file.
+    A file opened from disk is memory mapped, and other files,
+    such as decompressed and in-memory streams, are read in chunks,
+    so only one paragraph is held in memory at a time.
+    """
+    if isinstance(source, io.IOBase):
+        mapped = _map_file(source)
+        if mapped is None:
+            yield from _iter_chunks(source, encoding, chunk_size)
+            return
+        with mapped:
+            yield from _iter_buffer(mapped, encoding)
+        return
+
+    yield from _iter_buffer(source, encoding)
+
+
+def _iter_buffer(
+    data: bytes | bytearray | memoryview | mmap.mmap, encoding: str
+) -> typing.Generator[RawParagraph, None, None]:
+    start = 0
+    for match in RE_SEPARATOR.finditer(data):
+        paragraph = _paragraph(data[start : match.start()], encoding)
+        if paragraph is not None:
+            yield paragraph
+        start = match.end()
+    paragraph = _paragraph(data[start:], encoding)
+    if paragraph is not None:
+        yield paragraph
+
+
+def _iter_chunks(
+    source: io.IOBase, encoding: str, chunk_size: int
+) -> typing.Generator[RawParagraph, None, None]:
+    buffer = bytearray()
+    while chunk := source.read(chunk_size):
+        buffer.extend(chunk)
+        start = 0
+        for match in RE_SEPARATOR.finditer(buffer):
+            paragraph = _paragraph(buffer[start : match.start()], encoding)
+            if paragraph is not None:
+                yield paragraph
+            start = match.end()
+        # keep the part of the last paragraph that has been read
+        del buffer[:start]
+    paragraph = _paragraph(buffer, encoding)
+    if paragraph is not None:
+        yield paragraph
+
+
+def _paragraph(
+    data: bytes | bytearray | memoryview | mmap.mmap, encoding: str
+) -> RawParagraph | None:
+    content = bytes(data).strip(b" \t\r\n")
+    if not content:
+        return None
+    paragraph = RawParagraph(content, encoding)
+    # a paragraph that only contains comments has no fields
+    return paragraph if len(paragraph) else None
+
+
+def _map_file(source: io.IOBase) -> mmap.mmap | None:
+    # Only a regular file opened from disk can be mapped into memory.
+    # Decompressed streams also have a file number, but it is for the compressed file,
+    # and asking a spooled temporary file for its file number moves it to disk.
+    raw = source.raw if isinstance(source, io.BufferedReader) else source
+    if not isinstance(raw, io.FileIO):
+        return None
+    try:
+        if source.tell() != 0 or not stat.S_ISREG(os.fstat(raw.fileno()).st_mode):
+            return None
+        return mmap.mmap(raw.fileno(), 0, access=mmap.ACCESS_READ)
+    except (OSError, ValueError):
+        # empty files cannot be mapped
+        return None
@@ -1,20 +1,40 @@
+import bisect
+import concurrent.futures
+import datetime
+import functools
 import http
+import io
+import logging
 import pathlib
+import threading
 import typing
 
 from beartype import beartype
 
-from intrigue import http_client
+from intrigue import http_client, utils
 from intrigue.apt import (
+    contents,
     landmark,
+    packages,
+    snapshot,
+    tree_index,
 )
 from intrigue.apt import (
     models as apt_models,
 )
+from intrigue.apt import (
+    operations as apt_operations,
+)
 from intrigue.apt import (
     utils as apt_utils,
 )
 from intrigue.apt.landmark import KnownItem
+from intrigue.apt.utils import AptException
+from intrigue.gpg import message_armor_radix64
+
+logger = logging.getLogger(__name__)
+
+_TREE_INDEXES = tree_index.TreeIndexMemo()
 
 # TODO: https://s3.amazonaws.com/repo.mongodb.org/
 
@@ -28,6 +48,11 @@ from intrigue.apt.landmark import KnownItem
 
 # messages.info(request, request.META.get("REMOTE_ADDR"))
 
+# the compressed variants of index files to check for, in order of preference
+PROBE_EXTENSIONS = [".xz", ".gz"]
+# the landmarks that are directories
+PROBE_DIRS = {KnownItem.DISTS, KnownItem.POOL, KnownItem.BY_HASH, KnownItem.I18N}
+
 COMPONENTS_DIR_IGNORE = {
     i.casefold()
     for i in [
@@ -75,74 +100,631 @@ def get_links(client: http_client.HttpClient, url: str):
         return None
 
 
+@beartype
+def get_links_page(
+    client: http_client.HttpClient,
+    url: str,
+    after: str | None = None,
+    limit: int = 200,
+) -> http_client.HtmlListingPage | None:
+    """Get one page of the links in a directory listing, starting after a link.
+
+    The links are sorted by name, so each page starts at the first link
+    that sorts after the last link of the previous page.
+    The listing page is cached and its links are memoized,
+    so each page after the first does not download or parse the listing again."""
+    if limit < 1:
+        raise AptException("Page limit must be at least 1.")
+
+    listing = get_links(client, url)
+    if listing is None:
+        return None
+    return _page(url, listing.links, after, limit)
+
+
+@beartype
+def get_tree_index(
+    client: http_client.HttpClient, base_url: str
+) -> tree_index.TreeIndex | None:
+    """Get the index of the ls-lR.gz listing in a directory,
+    or None if the directory does not have one."""
+    url = landmark.top_listing_file(base_url).url
+
+    def _fetch() -> io.IOBase | None:
+        # The listing is kept in the response cache and revalidated when it expires,
+        # and a missing listing is cached for a short time like other missing items.
+        status, stream = client.get_stream(url, cache=True)
+        if status != http.HTTPStatus.OK:
+            return None
+        return stream
+
+    def _build(stream: io.IOBase) -> tree_index.TreeIndex | None:
+        try:
+            with (
+                utils.open_archive(url, stream) as data,
+                io.TextIOWrapper(data, encoding="utf-8", errors="replace") as text,
+            ):
+                return tree_index.TreeIndex.from_lines(text)
+        except (OSError, EOFError) as e:
+            logger.warning("Could not read the ls-lR listing %s: %s", url, e)
+            return None
+
+    return _TREE_INDEXES.get_or_build(url, _fetch, _build)
+
+
+@beartype
+def find_tree_index(
+    client: http_client.HttpClient, url: str, max_depth: int = 3
+) -> tuple[str, tree_index.TreeIndex] | None:
+    """Find an ls-lR.gz listing in the url or one of the directories above it,
+    starting from the top.
+    Returns the url of the directory containing the listing, and its index."""
+    parts = apt_utils.from_url(url)
+    for depth in range(min(len(parts.path), max_depth) + 1):
+        base_url = apt_utils.to_url(parts.scheme, parts.netloc, *parts.path[:depth])
+        index = get_tree_index(client, base_url)
+        if index is not None:
+            return base_url, index
+    return None
+
+
+@beartype
+def get_tree_page(
+    client: http_client.HttpClient,
+    url: str,
+    after: str | None = None,
+    limit: int = 200,
+) -> http_client.HtmlListingPage | None:
+    """Get one page of the links in a directory from an ls-lR.gz listing,
+    without requesting the directory's html listing.
+    Returns None if there is no listing, or the directory is not in it."""
+    if limit < 1:
+        raise AptException("Page limit must be at least 1.")
+
+    found = find_tree_index(client, url)
+    if found is None:
+        return None
+
+    base_url, index = found
+    base_path = apt_utils.from_url(base_url).path
+    path = apt_utils.from_url(url).path[len(base_path) :]
+    links = index.links("/".join(path))
+    if links is None:
+        return None
+    return _page(url, links, after, limit)
+
+
+@beartype
+def _page(
+    url: str, links: list[str], after: str | None, limit: int
+) -> http_client.HtmlListingPage:
+    """Get the page of the sorted links that starts after a link."""
+    start = bisect.bisect_right(links, after) if after is not None else 0
+    page_links = links[start : start + limit]
+    has_more = start + limit < len(links)
+
+    return http_client.HtmlListingPage(
+        url=url,
+        links=page_links,
+        after=after,
+        next_after=page_links[-1] if has_more else None,
+    )
+
+
 @beartype
 def _filter(items: typing.Iterable[str], ignored: typing.Collection[str]):
     results = set()
     for item in items:
         norm_item = item.casefold()
-        ignored = any(ignore in norm_item for ignore in ignored)
-        if ignored:
+        is_ignored = any(ignore in norm_item for ignore in ignored)
+        if is_ignored:
             continue
-        results.add(item)
+        # directory links end with a slash
+        results.add(item.rstrip("/"))
     return results
 
 
 @beartype
-def distributions(
-    client: http_client.HttpClient, repo_src: apt_models.RepositorySourceEntry
-) -> list[str]:
-    """Get the provided distributions or those available in the APT archive repository."""
-    results = set()
+class RepositoryCrawler:
+    """Walks the dists directory of an APT archive repository once.
+
+    Each directory listing is fetched at most once for each crawler,
+    and the distributions, components, architectures and releases
+    found in the listings are kept in the crawler.
+    Create a crawler for each request, so the results are never out of date.
+
+    When use_release is True, the components, architectures and index files
+    of each distribution are read from its Release file,
+    which works on mirrors that do not provide directory listings.
+    The directory listings are only used for distributions without a Release file.
+
+    When use_tree_index is True and the repository has an ls-lR.gz listing,
+    directories are read from the listing instead of requesting each html listing.
+
+    The listings at each level of the tree are requested at the same time,
+    using up to max_workers threads,
+    with at most host_concurrency requests in flight to each host.
+    """
+
+    def __init__(
+        self,
+        client: http_client.HttpClient,
+        repo_src: apt_models.RepositorySourceEntry,
+        max_workers: int = 8,
+        host_concurrency: int = 4,
+        use_release: bool = True,
+        use_tree_index: bool = False,
+    ):
+        if max_workers < 1:
+            raise AptException("Max workers must be at least 1.")
+        if host_concurrency < 1:
+            raise AptException("Host concurrency must be at least 1.")
+
+        self._client = client
+        self._repo_src = repo_src
+        self._max_workers = max_workers
+        self._host_concurrency = host_concurrency
+        self._use_release = use_release
+        self._use_tree_index = use_tree_index
+        self._listings: dict[str, http_client.HtmlListing | None] = {}
+        self._memo: dict[str, typing.Any] = {}
+        self._host_guard = threading.Lock()
+        self._host_semaphores: dict[str, threading.BoundedSemaphore] = {}
+
+    @property
+    def repo_src(self) -> apt_models.RepositorySourceEntry:
+        return self._repo_src
+
+    @property
+    def request_count(self) -> int:
+        """The number of directory listings requested by this crawler."""
+        return len(self._listings)
+
+    def dists_url(self, *parts: str) -> str:
+        """Build a url in the dists directory of the repository."""
+        url_parts = apt_utils.from_url(self._repo_src.url.url)
+        return apt_utils.to_url(
+            url_parts.scheme,
+            url_parts.netloc,
+            *url_parts.path,
+            KnownItem.DISTS.value,
+            *parts,
+        )
 
-    if repo_src.distributions:
-        return sorted(repo_src.distributions)
+    def dists_dir_url(self, *parts: str) -> str:
+        """Build a url to a directory in the dists directory of the repository.
+        The url ends with a slash, so the server does not need to redirect it."""
+        return f"{self.dists_url(*parts)}/"
+
+    def listing(self, url: str) -> http_client.HtmlListing | None:
+        """Get the html listing for a url, requesting it only once."""
+        if url not in self._listings:
+            self._listings[url] = self._fetch(url)
+        return self._listings[url]
+
+    def prefetch(self, urls: typing.Iterable[str]) -> None:
+        """Request the html listings for many urls at the same time."""
+        pending = sorted({url for url in urls if url not in self._listings})
+        if pending:
+            # get the tree index once, before the listings are requested
+            self.tree_index()
+        for url, result in zip(pending, self._map(self._fetch, pending)):
+            self._listings[url] = result
+
+    def tree_index(self) -> tree_index.TreeIndex | None:
+        """Get the index of the repository's ls-lR.gz listing,
+        or None if it is not used or not available."""
+        if not self._use_tree_index:
+            return None
+        return self._memoize(
+            "tree-index", lambda: get_tree_index(self._client, self._repo_src.url.url)
+        )
 
-    dists_parts = apt_utils.from_url(repo_src.url)
-    dists_url = apt_utils.to_url(
-        dists_parts.scheme,
-        dists_parts.netloc,
-        *dists_parts.path,
-        KnownItem.DISTS.value,
-    )
-    dists_listing = get_links(client, dists_url)
-    if not dists_listing:
+    def distributions(self) -> list[str]:
+        """Get the provided distributions or those available in the APT archive repository."""
+        if self._repo_src.distributions:
+            return sorted(self._repo_src.distributions)
+        return self._memoize("distributions", self._find_distributions)
+
+    def components(self) -> list[str]:
+        """Get the provided components or those available in the APT archive repository."""
+        if self._repo_src.components:
+            return sorted(self._repo_src.components)
+        return self._memoize("components", self._find_components)
+
+    def architectures(self) -> list[str]:
+        """Get the provided architectures or those available in the APT archive repository."""
+        if self._repo_src.architectures:
+            return sorted(self._repo_src.architectures)
+        return self._memoize("architectures", self._find_architectures)
+
+    def release(self, dist: str) -> dict:
+        """Get the release files for a distribution."""
+        return self._memoize(
+            f"release-{dist}", lambda: self._find_releases([dist])[dist]
+        )
+
+    def releases(self, revalidate: bool = False) -> dict[str, dict]:
+        """Get the release files for each distribution,
+        requesting the release files for all the distributions at the same time.
+        Set revalidate to True to check cached release files with the server,
+        so none of them are out of date."""
+        dists = self.distributions()
+        pending = [
+            dist for dist in dists if revalidate or f"release-{dist}" not in self._memo
+        ]
+        for dist, result in self._find_releases(pending, revalidate).items():
+            self._memo[f"release-{dist}"] = result
+            self._memo.pop(f"release-data-{dist}", None)
+        return {dist: self.release(dist) for dist in dists}
+
+    def release_data(self, dist: str) -> apt_models.Release | None:
+        """Get the parsed Release file for a distribution,
+        or None if it is missing or cannot be read."""
+        return self._memoize(f"release-data-{dist}", lambda: self._parse_release(dist))
+
+    def index_files(self, dist: str) -> list[apt_models.FileInfo]:
+        """Get the index files listed in a distribution's Release file,
+        with the SHA256 hash of each file."""
+        data = self.release_data(dist)
+        if not data:
+            return []
+        return [data.files[key] for key in sorted(data.files)]
+
+    def probe_landmarks(
+        self, landmarks: typing.Iterable[landmark.Landmark] | None = None
+    ) -> list[landmark.FoundLandmark]:
+        """Check which landmarks exist, using HEAD requests sent at the same time.
+        By default, the landmarks for the repository are checked.
+        For index files, the uncompressed file and the common compressed variants
+        are checked, and the first that exists is used."""
+        if landmarks is None:
+            landmarks = detect_landmarks(self._repo_src)
+
+        candidates = []
+        for item in landmarks:
+            if item.match_type == landmark.MatchType.COMPRESSED_FILE:
+                urls = [item.url, *(f"{item.url}{ext}" for ext in PROBE_EXTENSIONS)]
+            elif item.name in PROBE_DIRS:
+                urls = [f"{item.url}/"]
+            else:
+                urls = [item.url]
+            candidates.append((item, urls))
+
+        all_urls = sorted({url for _, urls in candidates for url in urls})
+        results = dict(zip(all_urls, self._map(self._head, all_urls)))
+
+        found = []
+        for item, urls in candidates:
+            for url in urls:
+                status, size = results[url]
+                if status == http.HTTPStatus.OK:
+                    found.append(
+                        landmark.FoundLandmark(landmark=item, url=url, size_bytes=size)
+                    )
+                    break
+        return found
+
+    def refresh(
+        self,
+        store: snapshot.SnapshotStore,
+        select: typing.Callable[[apt_models.FileInfo], bool] | None = None,
+    ) -> list[snapshot.DistChanges]:
+        """Crawl the repository again, requesting only what changed since the last crawl.
+
+        The Release file of each distribution is compared with the stored snapshot.
+        A distribution with the same Release Date as last time is skipped.
+        Otherwise, the selected index files with a new hash are downloaded
+        into the content store, using the by-hash urls when the Release file allows it,
+        and the new snapshot is stored once they have all been downloaded.
+        By default, the preferred compressed variant of each Packages index is selected.
+        """
+        if select is None:
+            select = _is_packages_index
+
+        repo_url = self._repo_src.url.url
+        previous = store.load(repo_url)
+        now = datetime.datetime.now(datetime.UTC)
+
+        # request the release files for all the distributions at the same time,
+        # checking with the server so a cached Release file is not mistaken for the latest
+        self.releases(revalidate=True)
+
+        results = []
+        for dist in self.distributions():
+            data = self.release_data(dist)
+            if data is None:
+                logger.warning("No Release file to refresh %s in %s", dist, repo_url)
+                continue
+
+            current = snapshot.DistSnapshot.from_release(
+                dist, data, self.index_files(dist)
+            )
+            before = previous.get(dist)
+            is_expired = _is_expired(current.valid_until, now)
+            if is_expired:
+                logger.warning(
+                    "The Release file for %s in %s has expired", dist, repo_url
+                )
+
+            if before is not None and current.is_same_release(before):
+                results.append(
+                    snapshot.DistChanges(
+                        dist=dist, is_unchanged=True, is_expired=is_expired
+                    )
+                )
+                continue
+
+            changed = current.changed_files(before)
+            selected = _preferred_variants(
+                [i for i in current.files.values() if select(i)]
+            )
+            changed_paths = set(changed)
+            wanted = [
+                i.url_relative for i in selected if i.url_relative in changed_paths
+            ]
+            statuses = self._map(functools.partial(self._get_index, current), wanted)
+            fetched = dict(zip(wanted, statuses))
+
+            # keep the old snapshot if any download failed, so the next refresh tries again
+            if all(status == http.HTTPStatus.OK for status in statuses):
+                store.save(repo_url, current, before)
+
+            results.append(
+                snapshot.DistChanges(
+                    dist=dist,
+                    is_unchanged=False,
+                    is_expired=is_expired,
+                    changed=changed,
+                    removed=current.removed_files(before),
+                    fetched=fetched,
+                )
+            )
+        return results
+
+    def _memoize(self, key: str, func: typing.Callable[[], typing.Any]):
+        if key not in self._memo:
+            self._memo[key] = func()
+        return self._memo[key]
+
+    def _map(self, func: typing.Callable[[str], typing.Any], items: list[str]) -> list:
+        # results are in the same order as the items
+        if len(items) < 2 or self._max_workers == 1:
+            return [func(item) for item in items]
+
+        workers = min(self._max_workers, len(items))
+        with concurrent.futures.ThreadPoolExecutor(max_workers=workers) as executor:
+            return list(executor.map(func, items))
+
+    def _host_slot(self, url: str) -> threading.BoundedSemaphore:
+        host = apt_utils.from_url(url).netloc or ""
+        with self._host_guard:
+            return self._host_semaphores.setdefault(
+                host, threading.BoundedSemaphore(self._host_concurrency)
+            )
+
+    def _fetch(self, url: str) -> http_client.HtmlListing | None:
+        index = self.tree_index()
+        if index is not None:
+            base_path = self._repo_src.url.path or []
+            path = apt_utils.from_url(url).path[len(base_path) :]
+            links = index.links("/".join(path))
+            if links is not None:
+                return http_client.HtmlListing(url=url, links=links)
+
+        with self._host_slot(url):
+            return get_links(self._client, url)
+
+    def _head(self, url: str) -> tuple[int, int | None]:
+        with self._host_slot(url):
+            return self._client.head(url)
+
+    def _get_raw(self, url: str, revalidate: bool = False) -> tuple[int, bytes | None]:
+        with self._host_slot(url):
+            return self._client.get_raw(url, revalidate=revalidate)
+
+    def _get_index(self, dist_snapshot: snapshot.DistSnapshot, path: str) -> int:
+        with self._host_slot(self._repo_src.url.url):
+            status, content = index_file(
+                self._client,
+                self._repo_src,
+                dist_snapshot.dist,
+                dist_snapshot.files[path],
+                by_hash=dist_snapshot.acquire_by_hash,
+            )
+        if content is not None:
+            content.close()
+        return status
+
+    def _find_distributions(self) -> list[str]:
+        dists_listing = self.listing(self.dists_dir_url())
+        if not dists_listing:
+            return []
+        return sorted(_filter(dists_listing.links, DISTRIBUTIONS_DIR_IGNORE))
+
+    def _find_components(self) -> list[str]:
+        results = set()
+        dists = self._listing_dists(results, lambda data: data.components)
+
+        self.prefetch(self.dists_dir_url(dist) for dist in dists)
+        for dist in dists:
+            comps_listing = self.listing(self.dists_dir_url(dist))
+            if not comps_listing:
+                continue
+            results.update(_filter(comps_listing.links, COMPONENTS_DIR_IGNORE))
         return sorted(results)
 
-    items = _filter(dists_listing.links, DISTRIBUTIONS_DIR_IGNORE)
-    results.update(items)
+    def _find_architectures(self) -> list[str]:
+        results = set()
+        # 'all' is not a machine architecture
+        dists = self._listing_dists(
+            results, lambda data: [i for i in data.architectures if i != "all"]
+        )
+
+        comps = self.components() if dists else []
+        self.prefetch(
+            self.dists_dir_url(dist, comp) for dist in dists for comp in comps
+        )
+        for dist in dists:
+            for comp in comps:
+                archs_listing = self.listing(self.dists_dir_url(dist, comp))
+                if not archs_listing:
+                    continue
+                items = _filter(archs_listing.links, ARCHITECTURES_DIR_IGNORE)
+                results.update(
+                    pathlib.Path(item.rsplit("-", maxsplit=1)[-1]).stem
+                    for item in items
+                )
+        return sorted(results)
 
-    return sorted(results)
+    def _listing_dists(
+        self,
+        results: set[str],
+        get_items: typing.Callable[[apt_models.Release], list[str] | None],
+    ) -> list[str]:
+        # Add the items from each distribution's Release file to the results.
+        # Returns the distributions that need to use the directory listings.
+        dists = self.distributions()
+        if not self._use_release:
+            return dists
+
+        self.releases()
+        remaining = []
+        for dist in dists:
+            data = self.release_data(dist)
+            items = get_items(data) if data else None
+            if items:
+                results.update(items)
+            else:
+                remaining.append(dist)
+        return remaining
+
+    def _parse_release(self, dist: str) -> apt_models.Release | None:
+        files = self.release(dist)
+        combined = files.get(KnownItem.RELEASE_COMBINED.value)
+        clear = files.get(KnownItem.RELEASE_CLEAR.value)
+        try:
+            if combined:
+                message = message_armor_radix64.read(combined["content"])
+                signed = message.signed_message
+                if signed is None:
+                    return None
+                return apt_operations.release(combined["url"], signed.text)
+            if clear:
+                text = clear["content"].decode("utf-8")
+                return apt_operations.release(clear["url"], text)
+        except ValueError as e:
+            logger.warning("Could not read the Release file for %s: %s", dist, e)
+        return None
+
+    def _find_releases(
+        self, dists: list[str], revalidate: bool = False
+    ) -> dict[str, dict]:
+        # Request the release files for all the distributions at the same time.
+        # The InRelease files are requested first.
+        # Once a distribution's InRelease is found,
+        # its Release.gpg and Release requests are cancelled if they have not started.
+        if not dists:
+            return {}
+
+        names = [
+            KnownItem.RELEASE_COMBINED.value,
+            KnownItem.RELEASE_DETACHED.value,
+            KnownItem.RELEASE_CLEAR.value,
+        ]
+        urls = {
+            (dist, name): self.dists_url(dist, name) for dist in dists for name in names
+        }
+        executor = concurrent.futures.ThreadPoolExecutor(
+            max_workers=min(self._max_workers, len(urls))
+        )
+        try:
+            futures = {
+                (dist, name): executor.submit(
+                    self._get_raw, urls[(dist, name)], revalidate
+                )
+                for name in names
+                for dist in dists
+            }
+            results = {}
+            for dist in dists:
+                found = {}
+                for name in names:
+                    status, content = futures[(dist, name)].result()
+                    if status == http.HTTPStatus.OK and content:
+                        found[name] = {"url": urls[(dist, name)], "content": content}
+                    if KnownItem.RELEASE_COMBINED.value in found:
+                        for other in names[1:]:
+                            futures[(dist, other)].cancel()
+                        break
+
+                # the detached signature is only useful with the clear file
+                is_complete = (
+                    KnownItem.RELEASE_COMBINED.value in found or len(found) == 2
+                )
+                results[dist] = found if is_complete else {}
+            return results
+        finally:
+            # requests already in flight finish in the background
+            executor.shutdown(wait=False, cancel_futures=True)
+
+
+def _is_packages_index(file_info: apt_models.FileInfo) -> bool:
+    name = file_info.url_relative.rsplit("/", maxsplit=1)[-1]
+    return _split_extension(name)[0] == KnownItem.PACKAGES.value
+
+
+def _split_extension(path: str) -> tuple[str, str]:
+    for items in utils.ARCHIVE_EXTENSIONS.values():
+        for ext in items:
+            if path.endswith(ext):
+                return path[: -len(ext)], ext
+    return path, ""
+
+
+def _preferred_variants(
+    files: list[apt_models.FileInfo],
+) -> list[apt_models.FileInfo]:
+    # keep one variant of each index file,
+    # preferring the compressed variants that are probed, then any compressed variant
+    def _rank(ext: str) -> int:
+        if ext in PROBE_EXTENSIONS:
+            return PROBE_EXTENSIONS.index(ext)
+        return len(PROBE_EXTENSIONS) + (0 if ext else 1)
+
+    best: dict[str, apt_models.FileInfo] = {}
+    for file_info in files:
+        path, ext = _split_extension(file_info.url_relative)
+        current = best.get(path)
+        if current is None or _rank(ext) < _rank(
+            _split_extension(current.url_relative)[1]
+        ):
+            best[path] = file_info
+    return [best[path] for path in sorted(best)]
+
+
+def _is_expired(valid_until: datetime.datetime | None, now: datetime.datetime) -> bool:
+    if valid_until is None:
+        return False
+    if valid_until.tzinfo is None:
+        valid_until = valid_until.replace(tzinfo=datetime.UTC)
+    return valid_until < now
 
 
 @beartype
-def components(
+def distributions(
     client: http_client.HttpClient, repo_src: apt_models.RepositorySourceEntry
 ) -> list[str]:
-    """Get the provided components or those available in the APT archive repository."""
-    results = set()
-
-    if repo_src.components:
-        return sorted(repo_src.components)
-
-    src_url = repo_src.url
-    dists = distributions(client, repo_src)
-    for dist in dists:
-        comps_parts = apt_utils.from_url(src_url)
-        comps_url = apt_utils.to_url(
-            comps_parts.scheme,
-            comps_parts.netloc,
-            *comps_parts.path,
-            KnownItem.DISTS.value,
-            dist,
-        )
-        comps_listing = get_links(client, comps_url)
-        if not comps_listing:
-            continue
+    """Get the provided distributions or those available in the APT archive repository."""
+    return RepositoryCrawler(client, repo_src).distributions()
 
-        items = _filter(comps_listing.links, COMPONENTS_DIR_IGNORE)
-        results.update(items)
 
-    return sorted(results)
+@beartype
+def components(
+    client: http_client.HttpClient, repo_src: apt_models.RepositorySourceEntry
+) -> list[str]:
+    """Get the provided components or those available in the APT archive repository."""
+    return RepositoryCrawler(client, repo_src).components()
 
 
 @beartype
@@ -150,36 +732,7 @@ def architectures(
     client: http_client.HttpClient, repo_src: apt_models.RepositorySourceEntry
 ) -> typing.Iterable[str]:
     """Get the provided architectures or those available in the APT archive repository."""
-    results = set()
-
-    if repo_src.architectures:
-        return sorted(repo_src.architectures)
-
-    src_url = repo_src.url
-    dists = distributions(client, repo_src)
-    comps = components(client, repo_src)
-
-    for dist in dists:
-        for comp in comps:
-            archs_parts = apt_utils.from_url(src_url)
-            archs_url = apt_utils.to_url(
-                archs_parts.scheme,
-                archs_parts.netloc,
-                *archs_parts.path,
-                KnownItem.DISTS.value,
-                dist,
-                comp,
-            )
-            archs_listing = get_links(client, archs_url)
-            if not archs_listing:
-                continue
-
-            items = _filter(archs_listing.links, ARCHITECTURES_DIR_IGNORE)
-            results.update(
-                [pathlib.Path(item.rsplit("-", maxsplit=1)[-1]).stem for item in items]
-            )
-
-    return sorted(results)
+    return RepositoryCrawler(client, repo_src).architectures()
 
 
 @beartype
@@ -188,65 +741,104 @@ def release(
     repo_src: apt_models.RepositorySourceEntry,
     dist: str,
 ):
-    dists = KnownItem.DISTS.value
-    rel_combined = KnownItem.RELEASE_COMBINED.value
-
-    combined_parts = apt_utils.from_url(repo_src.url)
-    combined_url = apt_utils.to_url(
-        combined_parts.scheme,
-        combined_parts.netloc,
-        *combined_parts.path,
-        dists,
-        dist,
-        rel_combined,
-    )
-    status_combined, content_combined = client.get_raw(combined_url)
-    if status_combined == http.HTTPStatus.OK and content_combined:
-        return {
-            KnownItem.RELEASE_COMBINED.value: {
-                "url": combined_url,
-                "content": content_combined,
-            }
-        }
+    return RepositoryCrawler(client, repo_src).release(dist)
 
-    rel_detached = KnownItem.RELEASE_DETACHED.value
-    detached_parts = apt_utils.from_url(repo_src.url)
-    detached_url = apt_utils.to_url(
-        detached_parts.scheme,
-        detached_parts.netloc,
-        *detached_parts.path,
-        dists,
-        dist,
-        rel_detached,
-    )
-    status_detached, content_detached = client.get_raw(detached_url)
-
-    rel_clear = KnownItem.RELEASE_CLEAR.value
-    clear_parts = apt_utils.from_url(repo_src.url)
-    clear_url = apt_utils.to_url(
-        clear_parts.scheme,
-        clear_parts.netloc,
-        *clear_parts.path,
-        dists,
-        dist,
-        rel_clear,
+
+@beartype
+def index_file(
+    client: http_client.HttpClient,
+    repo_src: apt_models.RepositorySourceEntry,
+    dist: str,
+    file_info: apt_models.FileInfo,
+    by_hash: bool = False,
+) -> tuple[int, io.IOBase | None]:
+    """Get an index file listed in a dist's Release file.
+
+    When the Release file provides the file's SHA256,
+    content already downloaded from any url is used instead of downloading it again.
+    When by_hash is True, the file is requested from its by-hash url,
+    which does not change while the repository is being updated.
+    The canonical url is used if the by-hash url is not available.
+    A file that does not match the Release file's SHA256 is not returned,
+    and the status is 502 Bad Gateway.
+    The caller must close the returned file."""
+    parts = apt_utils.from_url(repo_src.url.url)
+    path = file_info.url_relative.split("/")
+
+    def _url(*items: str) -> str:
+        return apt_utils.to_url(
+            parts.scheme,
+            parts.netloc,
+            *parts.path,
+            KnownItem.DISTS.value,
+            dist,
+            *items,
+        )
+
+    sha256 = (
+        file_info.hash_value
+        if file_info.hash_type == apt_models.FileHashType.Sha256
+        else None
     )
-    status_clear, content_clear = client.get_raw(clear_url)
-    if (status_detached == http.HTTPStatus.OK and content_detached) and (
-        status_clear == http.HTTPStatus.OK and content_clear
-    ):
-        return {
-            KnownItem.RELEASE_DETACHED.value: {
-                "url": detached_url,
-                "content": content_detached,
-            },
-            KnownItem.RELEASE_CLEAR.value: {
-                "url": clear_url,
-                "content": content_clear,
-            },
-        }
 
-    return {}
+    def _get(url: str) -> tuple[int, io.IOBase | None]:
+        try:
+            return client.get_stream(url, sha256=sha256)
+        except AptException as e:
+            # a mirror part way through an update can serve
+            # an index file that does not match its Release file yet
+            logger.warning("Could not get the index file %s: %s", url, e)
+            return http.HTTPStatus.BAD_GATEWAY, None
+
+    if by_hash and sha256:
+        status, content = _get(
+            _url(*path[:-1], KnownItem.BY_HASH.value, "SHA256", sha256)
+        )
+        if status == http.HTTPStatus.OK and content is not None:
+            return status, content
+        if content is not None:
+            content.close()
+    return _get(_url(*path))
+
+
+@beartype
+def package_table(
+    client: http_client.HttpClient,
+    repo_src: apt_models.RepositorySourceEntry,
+    dist: str,
+    file_info: apt_models.FileInfo,
+) -> packages.PackageTable | None:
+    """Load a Packages index listed in a dist's Release file into a package table.
+    The index is decompressed and parsed one paragraph at a time."""
+    status, content = index_file(client, repo_src, dist, file_info)
+    if status != http.HTTPStatus.OK or content is None:
+        return None
+    with content, utils.open_archive(file_info.url_relative, content) as stream:
+        return packages.PackageTable.from_source(stream)
+
+
+@beartype
+def contents_index(
+    client: http_client.HttpClient,
+    repo_src: apt_models.RepositorySourceEntry,
+    dist: str,
+    file_info: apt_models.FileInfo,
+    store: contents.ContentsIndexStore,
+) -> contents.ContentsIndex | None:
+    """Get the index of a Contents file listed in a dist's Release file.
+    The Contents file is only downloaded and indexed
+    if the index for its hash has not been built before.
+    The caller must close the returned index."""
+    digest = f"{file_info.hash_type.name.lower()}-{file_info.hash_value}"
+    index = store.open(digest)
+    if index is not None:
+        return index
+
+    status, content = index_file(client, repo_src, dist, file_info)
+    if status != http.HTTPStatus.OK or content is None:
+        return None
+    with content, utils.open_archive(file_info.url_relative, content) as stream:
+        return store.build(digest, stream)
 
 
 @beartype
@@ -264,7 +856,7 @@ def detect_landmarks(
         landmark.top_listing_file(url),
         landmark.pool_dir(url),
     ]
-    for dist in repo_src.distributions:
+    for dist in repo_src.distributions or []:
         # base and dist
         landmarks.extend(
             [
@@ -274,20 +866,13 @@ def detect_landmarks(
                 landmark.dist_by_hash_dir(url, dist),
             ]
         )
-        for comp in repo_src.components:
+        for arch in repo_src.architectures or []:
+            # base, dist, arch
+            landmarks.append(landmark.contents_arch_file(url, dist, arch))
+        for comp in repo_src.components or []:
             # base, dist, comp
-            landmarks.extend(
-                [
-                    landmark.i18n_dir(url, dist, comp),
-                ]
-            )
-            for arch in repo_src.architectures:
-                # base, dist, arch
-                landmarks.extend(
-                    [
-                        landmark.contents_arch_file(url, dist, arch),
-                    ]
-                )
+            landmarks.append(landmark.i18n_dir(url, dist, comp))
+            for arch in repo_src.architectures or []:
                 # base, dist, comp, arch
                 landmarks.extend(
                     [
@@ -296,12 +881,21 @@ def detect_landmarks(
                         landmark.arch_release_file(url, dist, comp, arch),
                     ]
                 )
-    # use the found urls from the html listing
-    # and compare to the built landmarks
-    # TODO
-    # listing = get_links(client, comps_url)
-    # for found_url in html_listing.urls:
-    #     for landmark_item in landmarks:
-    #         if landmark_item.match(found_url):
-    #             return found_url, landmark_item
     return landmarks
+
+
+@beartype
+def probe_landmarks(
+    client: http_client.HttpClient, repo_src: apt_models.RepositorySourceEntry
+) -> list[landmark.FoundLandmark]:
+    """Check which of the repository's landmarks exist."""
+    return RepositoryCrawler(client, repo_src).probe_landmarks()
+
+
+@beartype
+def match_landmarks(
+    landmarks: typing.Iterable[landmark.Landmark], urls: typing.Iterable[str]
+) -> list[tuple[str, landmark.Landmark]]:
+    """Find the urls that are landmarks, such as the urls in a html listing.
+    Compressed variants of index files, such as Packages.xz, match their landmark."""
+    return landmark.LandmarkIndex(landmarks).match_all(urls)
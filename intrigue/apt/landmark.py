@@ -1,4 +1,5 @@
 import enum
+import typing
 
 import attrs
 from beartype import beartype
@@ -47,14 +48,98 @@ class Landmark:
             result = landmark_parts == found_parts
             return result
         if self.match_type == MatchType.COMPRESSED_FILE:
-            for name in utils.archive_extensions(landmark_parts.path[-1]):
-                # TODO
-                new_landmark_parts = apt_utils.SimpleUrl()
-                if new_landmark_parts == found_parts:
-                    return True
+            return _path_key(found_parts) in set(_landmark_keys(self))
         return False
 
 
+@beartype
+@attrs.frozen
+class FoundLandmark:
+    """A landmark that was found to exist."""
+
+    landmark: Landmark
+    url: str
+    """The url that exists, which can be a compressed variant of the landmark url."""
+    size_bytes: int | None
+    """The size reported by the server, if it provided one."""
+
+
+def _path_key(parts: apt_utils.SimpleUrl) -> tuple[str, ...]:
+    # the host is not case-sensitive, and the path segments already
+    # exclude empty segments, so a trailing slash does not matter
+    return (parts.netloc or "").casefold(), *(parts.path or [])
+
+
+def _landmark_keys(item: Landmark) -> typing.Iterator[tuple[str, ...]]:
+    key = _path_key(apt_utils.from_url(item.url))
+    yield key
+    if item.match_type == MatchType.COMPRESSED_FILE and len(key) > 1:
+        for name in utils.archive_extensions(key[-1]):
+            yield *key[:-1], name
+
+
+@beartype
+class LandmarkIndex:
+    """Finds the landmark for a url by looking up the url's path segments.
+
+    The urls of the landmarks, and the compressed variants of the file landmarks,
+    are parsed once when the index is built,
+    so matching a url is one parse and one lookup.
+    """
+
+    def __init__(self, landmarks: typing.Iterable[Landmark]):
+        self._items: dict[tuple[str, ...], Landmark] = {}
+        for item in landmarks:
+            for key in _landmark_keys(item):
+                self._items.setdefault(key, item)
+
+    def __len__(self) -> int:
+        return len(self._items)
+
+    def match(self, url: str) -> Landmark | None:
+        """Get the landmark the url matches, or None."""
+        return self._items.get(_path_key(apt_utils.from_url(url)))
+
+    def match_all(self, urls: typing.Iterable[str]) -> list[tuple[str, Landmark]]:
+        """Get the urls that match a landmark, with the landmark they match."""
+        results = []
+        for url in urls:
+            item = self.match(url)
+            if item is not None:
+                results.append((url, item))
+        return results
+
+
+@beartype
+def classify(url: str) -> KnownItem:
+    """Get the kind of repository item the url refers to, based on its path."""
+    path = apt_utils.from_url(url).path or []
+    if not path:
+        return KnownItem.UNKNOWN
+
+    name = path[-1]
+    if KnownItem.BY_HASH.value in path:
+        return KnownItem.BY_HASH
+    if KnownItem.POOL.value in path:
+        return KnownItem.POOL
+    for item in [
+        KnownItem.RELEASE_COMBINED,
+        KnownItem.RELEASE_DETACHED,
+        KnownItem.RELEASE_CLEAR,
+        KnownItem.TOP_LISTING,
+        KnownItem.DISTS,
+    ]:
+        if name == item.value:
+            return item
+    if name.split(".")[0] == KnownItem.PACKAGES.value:
+        return KnownItem.PACKAGES
+    if name.startswith(f"{KnownItem.CONTENTS.value}-"):
+        return KnownItem.CONTENTS
+    if KnownItem.I18N.value in path:
+        return KnownItem.I18N
+    return KnownItem.UNKNOWN
+
+
 @beartype
 def dists_dir(base: str):
     path = [KnownItem.DISTS.value]
@@ -104,12 +104,19 @@ class Paragraph:
     """A paragraph in a control file."""
 
     fields: list[Field] = attrs.field(factory=list)
+    """The fields in the order they appear."""
 
-    def get_field_value(self, name: str) -> typing.Optional[Field]:
+    _index: dict[str, Field] = attrs.field(init=False, repr=False, eq=False)
+    """The fields keyed by their case-folded name, as field names are not case-sensitive."""
+
+    def __attrs_post_init__(self):
+        index = {}
         for field in self.fields:
-            if field.name == name:
-                return field
-        return None
+            index.setdefault(field.name.casefold(), field)
+        object.__setattr__(self, "_index", index)
+
+    def get_field_value(self, name: str) -> typing.Optional[Field]:
+        return self._index.get(name.casefold())
 
 
 @beartype
@@ -190,6 +197,22 @@ class FileInfo:
     size_bytes: int
     """The file size in bytes."""
 
+    @classmethod
+    def from_hash_line(
+        cls, hash_type: FileHashType, line: str
+    ) -> typing.Optional["FileInfo"]:
+        """Parse a line of a hash field in a Release file,
+        such as ' <hash> <size> main/binary-amd64/Packages'."""
+        if not line or not line.strip():
+            return None
+        hash_value, size_bytes, url_relative = line.split()
+        return cls(
+            url_relative=url_relative,
+            hash_type=hash_type,
+            hash_value=hash_value,
+            size_bytes=int(size_bytes),
+        )
+
 
 @beartype
 @attrs.frozen
@@ -251,15 +274,72 @@ class Release:
     the optional "by-hash" locations as an alternative 
     to the canonical location (and name) of an index file."""
 
-    hashes: list[FileInfo] = attrs.field(factory=list)
-    """Describe the package index files present.
+    hash_sections: dict[FileHashType, list[str]] = attrs.field(factory=dict)
+    """The lines of each hash field, which describe the package index files present.
     When release signature is available it certifies 
     that listed index files and files referenced by those index files are genuine.
     
     Clients may not use the MD5Sum and SHA1 fields for security purposes, 
     and must require a SHA256 or a SHA512 field. 
+
+    The lines are only parsed when the files are used.
     """
 
+    _files: dict[str, FileInfo] | None = attrs.field(
+        init=False, default=None, repr=False, eq=False
+    )
+
+    @property
+    def hashes(self) -> list[FileInfo]:
+        """Every hash of every file, parsed each time they are used.
+        Use files to get the SHA256 hash of each file."""
+        return [
+            file_info
+            for hash_type in reversed(FileHashType.preferred())
+            for line in self.hash_sections.get(hash_type, [])
+            if (file_info := FileInfo.from_hash_line(hash_type, line)) is not None
+        ]
+
+    @property
+    def files(self) -> dict[str, FileInfo]:
+        """The SHA256 hash of each file, keyed by the relative url.
+
+        SHA256 is used because by-hash urls, the content store and crawl snapshots
+        are keyed by it. When the Release file has no SHA256 field,
+        the SHA512 field is used, and the MD5Sum and SHA1 fields only if neither exists.
+        The table is built the first time it is used."""
+        if self._files is None:
+            object.__setattr__(self, "_files", self._build_files())
+        return self._files
+
+    def file_info(
+        self, url_relative: str, hash_type: FileHashType | None = None
+    ) -> FileInfo | None:
+        """Get the hash and the size of a file listed in the Release file.
+        By default, the hash is the same as in files.
+        Give a hash type to get that hash, or None if the file does not have one."""
+        if hash_type is None:
+            return self.files.get(url_relative)
+        for line in self.hash_sections.get(hash_type, []):
+            file_info = FileInfo.from_hash_line(hash_type, line)
+            if file_info is not None and file_info.url_relative == url_relative:
+                return file_info
+        return None
+
+    def _build_files(self) -> dict[str, FileInfo]:
+        secure = [FileHashType.Sha256, FileHashType.Sha512]
+        hash_types = [i for i in secure if i in self.hash_sections][:1] or [
+            i for i in FileHashType.preferred() if i in self.hash_sections
+        ]
+        files: dict[str, FileInfo] = {}
+        # the stronger weak hash type is first, so it is kept for each file
+        for hash_type in hash_types:
+            for line in self.hash_sections[hash_type]:
+                file_info = FileInfo.from_hash_line(hash_type, line)
+                if file_info is not None:
+                    files.setdefault(file_info.url_relative, file_info)
+        return files
+
 
 @beartype
 @attrs.frozen
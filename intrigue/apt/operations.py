@@ -1,10 +1,10 @@
 import logging
 import re
-import typing
 
 from beartype import beartype
 
 from intrigue import utils
+from intrigue.apt import deb822
 from intrigue.apt import models as apt_models
 from intrigue.apt import utils as apt_utils
 from intrigue.apt.utils import AptException
@@ -19,71 +19,23 @@ RE_LIST_ENTRY: re.Pattern[str] = re.compile(
 @beartype
 def paragraph(content: str) -> apt_models.Paragraph:
     """Parse string content into a Paragraph item."""
-    lines = (content or "").strip().splitlines()
-    if not lines:
+    items = list(deb822.iter_paragraphs((content or "").encode("utf-8")))
+    if not items:
         return apt_models.Paragraph()
-
-    fields = []
-
-    current_key: typing.Optional[str] = None
-    current_value: typing.Optional[list[str]] = None
-    for line in lines:
-        # paragraph end (blank line)
-        if (not line or not line.strip()) and fields:
-            raise AptException("A paragraph cannot contain an empty line.")
-
-        # comment line
-        if line.startswith("#"):
-            continue
-
-        # continuation line
-        if line != line.lstrip():
-            current_value.append(line.lstrip())
-            continue
-
-        # add previous key and value to file
-        if current_key:
-            fields.append(apt_models.Field(name=current_key, values=current_value))
-
-        # get the key and value
-        if ":" not in line:
-            raise AptException(f"Invalid paragraph line '{line}'.")
-
-        line_key, line_value = line.split(":", maxsplit=1)
-        current_key = line_key.strip()
-        current_value = [line_value.strip()]
-
-    if current_key:
-        fields.append(apt_models.Field(name=current_key, values=current_value))
-
-    return apt_models.Paragraph(fields=fields)
+    if len(items) > 1:
+        raise AptException("A paragraph cannot contain an empty line.")
+    return items[0].to_paragraph()
 
 
 @beartype
 def control(content: str) -> apt_models.Control:
     """Parse string content into a Control item."""
-    lines = (content or "").strip().splitlines()
-    if not lines:
-        return apt_models.Control()
-
-    paragraphs = []
-
-    current_lines = []
-    for line in lines:
-        # paragraph end (blank line)
-        if (not line or not line.strip()) and current_lines:
-            para = paragraph("\n".join(current_lines))
-            paragraphs.append(para)
-            current_lines = []
-            continue
-
-        current_lines.append(line)
-
-    if current_lines:
-        para = paragraph("\n".join(current_lines))
-        paragraphs.append(para)
-
-    return apt_models.Control(paragraphs=paragraphs)
+    return apt_models.Control(
+        paragraphs=[
+            item.to_paragraph()
+            for item in deb822.iter_paragraphs((content or "").encode("utf-8"))
+        ]
+    )
 
 
 @beartype
@@ -106,26 +58,11 @@ def release(url: str, content: str) -> apt_models.Release | None:
             return f.values[0]
         elif process == "space_sep_items":
             return [i for v in f.values for i in v.split(" ")]
-        elif process == "file_info":
-            result = []
-            for v in f.values:
-                if not v or not v.strip():
-                    continue
-                hash_type = apt_models.FileHashType.from_control_field(name)
-                hash_value, size_bytes, rel_url = (i for i in v.split(" ") if i)
-                result.append(
-                    apt_models.FileInfo(
-                        url_relative=rel_url,
-                        hash_type=hash_type,
-                        hash_value=hash_value,
-                        size_bytes=int(size_bytes),
-                    )
-                )
-            return result
         else:
             raise AptException(f"Unknown process {process}")
 
     p = control_item.paragraphs[0]
+    valid_until = _get("Valid-Until")
     data = {
         "acquire_by_hash": _get("Acquire-By-Hash"),
         "architectures": _get("Architectures", "space_sep_items"),
@@ -133,11 +70,13 @@ def release(url: str, content: str) -> apt_models.Release | None:
         "components": _get("Components", "space_sep_items"),
         "date": utils.get_date(_get("Date")),
         "description": _get("Description"),
-        "hashes": [
-            *_get("MD5Sum", "file_info"),
-            *_get("SHA1", "file_info"),
-            *_get("SHA256", "file_info"),
-        ],
+        # the hash lines are only parsed when they are used,
+        # and newer Release files only list SHA256 hashes
+        "hash_sections": {
+            apt_models.FileHashType.from_control_field(name): field.values
+            for name in ["MD5Sum", "SHA1", "SHA256", "SHA512"]
+            if (field := p.get_field_value(name))
+        },
         "label": _get("Label"),
         "origin": _get("Origin"),
         "suite": _get("Suite"),
@@ -145,7 +84,7 @@ def release(url: str, content: str) -> apt_models.Release | None:
         "url": url,
         "changelogs": None,
         "no_support_for_architecture_all": None,
-        "valid_until": None,
+        "valid_until": utils.get_date(valid_until) if valid_until else None,
     }
 
     return apt_models.Release(**data)
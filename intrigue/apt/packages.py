@@ -0,0 +1,236 @@
+"""Loads the binary package indices (Packages files) of an APT archive repository."""
+
+import array
+import logging
+import typing
+
+import attrs
+from beartype import beartype
+
+from intrigue.apt import deb822
+
+logger = logging.getLogger(__name__)
+
+
+@beartype
+@attrs.frozen
+class BinaryPackage:
+    """One binary package in a Packages index."""
+
+    name: str
+    version: str
+    architecture: str
+    filename: str
+    size_bytes: int
+    sha256: str | None = None
+    installed_size_kib: int | None = None
+    """The Installed-Size field, an estimate of the space used in kibibytes."""
+    source: str | None = None
+    section: str | None = None
+    priority: str | None = None
+    maintainer: str | None = None
+    depends: str | None = None
+    description: str | None = None
+    """The first line of the description."""
+
+
+class _TextColumn:
+    """Strings stored end to end in one buffer, for values that are mostly different."""
+
+    __slots__ = ("data", "ends")
+
+    def __init__(self):
+        self.data = bytearray()
+        self.ends = array.array("Q")
+
+    def append(self, value: str | None) -> None:
+        if value is not None:
+            self.data.extend(value.encode("utf-8"))
+        self.ends.append(len(self.data))
+
+    def get(self, index: int) -> str:
+        start = self.ends[index - 1] if index > 0 else 0
+        return self.data[start : self.ends[index]].decode("utf-8")
+
+    @property
+    def nbytes(self) -> int:
+        return len(self.data) + self.ends.itemsize * len(self.ends)
+
+
+class _CategoryColumn:
+    """A code for each row and a list of the distinct values,
+    for values that repeat, such as architectures and sections."""
+
+    __slots__ = ("codes", "lookup", "values")
+
+    def __init__(self):
+        self.values: list[str | None] = [None]
+        self.lookup: dict[str | None, int] = {None: 0}
+        self.codes = array.array("I")
+
+    def append(self, value: str | None) -> None:
+        code = self.lookup.get(value)
+        if code is None:
+            code = len(self.values)
+            self.lookup[value] = code
+            self.values.append(value)
+        self.codes.append(code)
+
+    def get(self, index: int) -> str | None:
+        return self.values[self.codes[index]]
+
+    @property
+    def nbytes(self) -> int:
+        return self.codes.itemsize * len(self.codes) + sum(
+            len(i) for i in self.values if i
+        )
+
+
+@beartype
+class PackageTable:
+    """The packages from a Packages index, stored in compact columns.
+
+    Text that is mostly different for each package is stored end to end in one buffer,
+    text that repeats is stored once with a code for each package,
+    and numbers and hashes are stored in arrays,
+    so a large index uses a small fraction of the memory of one object per package.
+    Rows are read back as BinaryPackage items.
+    """
+
+    def __init__(self):
+        self._names = _TextColumn()
+        self._versions = _TextColumn()
+        self._filenames = _TextColumn()
+        self._depends = _TextColumn()
+        self._descriptions = _TextColumn()
+        self._architectures = _CategoryColumn()
+        self._sources = _CategoryColumn()
+        self._sections = _CategoryColumn()
+        self._priorities = _CategoryColumn()
+        self._maintainers = _CategoryColumn()
+        self._sizes = array.array("q")
+        self._installed_sizes = array.array("q")
+        self._sha256 = bytearray()
+        self._by_name: dict[str, list[int]] | None = None
+
+    @classmethod
+    def from_source(
+        cls, source: deb822.Source, encoding: str = "utf-8"
+    ) -> "PackageTable":
+        """Load the packages from the content of a Packages file,
+        reading one paragraph at a time."""
+        return cls.from_paragraphs(deb822.iter_paragraphs(source, encoding))
+
+    @classmethod
+    def from_paragraphs(
+        cls, paragraphs: typing.Iterable[deb822.RawParagraph]
+    ) -> "PackageTable":
+        table = cls()
+        skipped = 0
+        for paragraph in paragraphs:
+            if not table._append(paragraph):
+                skipped += 1
+        if skipped:
+            logger.warning("Skipped %s paragraphs without a package name", skipped)
+        logger.info("Loaded %s packages", len(table))
+        return table
+
+    def __len__(self) -> int:
+        return len(self._sizes)
+
+    def __iter__(self) -> typing.Iterator[BinaryPackage]:
+        for index in range(len(self)):
+            yield self.row(index)
+
+    @property
+    def nbytes(self) -> int:
+        """An estimate of the memory used by the columns."""
+        columns = [
+            self._names,
+            self._versions,
+            self._filenames,
+            self._depends,
+            self._descriptions,
+            self._architectures,
+            self._sources,
+            self._sections,
+            self._priorities,
+            self._maintainers,
+        ]
+        arrays = [self._sizes, self._installed_sizes]
+        return (
+            sum(i.nbytes for i in columns)
+            + sum(i.itemsize * len(i) for i in arrays)
+            + len(self._sha256)
+        )
+
+    def row(self, index: int) -> BinaryPackage:
+        """Get the package at a position in the index."""
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError(f"Package index {index} is out of range.")
+
+        sha256 = self._sha256[index * 32 : (index + 1) * 32]
+        installed_size = self._installed_sizes[index]
+        return BinaryPackage(
+            name=self._names.get(index),
+            version=self._versions.get(index),
+            architecture=self._architectures.get(index) or "",
+            filename=self._filenames.get(index),
+            size_bytes=self._sizes[index],
+            sha256=sha256.hex() if any(sha256) else None,
+            installed_size_kib=installed_size if installed_size >= 0 else None,
+            source=self._sources.get(index),
+            section=self._sections.get(index),
+            priority=self._priorities.get(index),
+            maintainer=self._maintainers.get(index),
+            depends=self._depends.get(index) or None,
+            description=self._descriptions.get(index) or None,
+        )
+
+    def lookup(self, name: str) -> list[BinaryPackage]:
+        """Get the packages with a name, such as the versions for each architecture."""
+        if self._by_name is None:
+            by_name: dict[str, list[int]] = {}
+            for index in range(len(self)):
+                by_name.setdefault(self._names.get(index), []).append(index)
+            self._by_name = by_name
+        return [self.row(i) for i in self._by_name.get(name, [])]
+
+    def _append(self, paragraph: deb822.RawParagraph) -> bool:
+        name = paragraph.get("Package")
+        if not name:
+            return False
+
+        self._names.append(name)
+        self._versions.append(paragraph.get("Version"))
+        self._filenames.append(paragraph.get("Filename"))
+        depends = paragraph.values("Depends")
+        self._depends.append(" ".join(depends) if depends else None)
+        self._descriptions.append(paragraph.get("Description"))
+        self._architectures.append(paragraph.get("Architecture"))
+        self._sources.append(paragraph.get("Source"))
+        self._sections.append(paragraph.get("Section"))
+        self._priorities.append(paragraph.get("Priority"))
+        self._maintainers.append(paragraph.get("Maintainer"))
+        self._sizes.append(_to_int(paragraph.get("Size"), 0))
+        self._installed_sizes.append(_to_int(paragraph.get("Installed-Size"), -1))
+
+        sha256 = paragraph.get("SHA256")
+        try:
+            digest = bytes.fromhex(sha256) if sha256 else b""
+        except ValueError:
+            digest = b""
+        self._sha256.extend(digest if len(digest) == 32 else bytes(32))
+
+        # the name index is built again when it is next used
+        self._by_name = None
+        return True
+
+
+def _to_int(value: str | None, default: int) -> int:
+    try:
+        return int(value) if value else default
+    except ValueError:
+        return default
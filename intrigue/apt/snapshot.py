@@ -0,0 +1,208 @@
+"""Records what was found the last time an APT archive repository was crawled."""
+
+import datetime
+import logging
+import pathlib
+
+import attrs
+from beartype import beartype
+
+from intrigue import utils
+from intrigue.apt import models as apt_models
+
+logger = logging.getLogger(__name__)
+
+
+@beartype
+@attrs.frozen
+class DistSnapshot:
+    """The state of one distribution's Release file when it was crawled."""
+
+    dist: str
+    date: datetime.datetime | None
+    """The Date field of the Release file."""
+    valid_until: datetime.datetime | None
+    """The Valid-Until field of the Release file."""
+    acquire_by_hash: bool
+    """Whether the index files can be requested by their hash."""
+    files: dict[str, apt_models.FileInfo] = attrs.field(factory=dict)
+    """The index files listed in the Release file, keyed by their relative url."""
+
+    @classmethod
+    def from_release(
+        cls, dist: str, release: apt_models.Release, files: list[apt_models.FileInfo]
+    ) -> "DistSnapshot":
+        return cls(
+            dist=dist,
+            date=release.date,
+            valid_until=release.valid_until,
+            acquire_by_hash=(release.acquire_by_hash or "").lower() == "yes",
+            files={i.url_relative: i for i in files},
+        )
+
+    def is_same_release(self, other: "DistSnapshot") -> bool:
+        """Check whether two snapshots are of the same Release file.
+        A Release file without a Date is never assumed to be unchanged."""
+        return self.date is not None and self.date == other.date
+
+    def changed_files(self, previous: "DistSnapshot | None") -> list[str]:
+        """Get the relative urls of the index files that are new or have a different hash."""
+        if previous is None:
+            return sorted(self.files)
+        return sorted(
+            path
+            for path, file_info in self.files.items()
+            if previous.files.get(path) != file_info
+        )
+
+    def removed_files(self, previous: "DistSnapshot | None") -> list[str]:
+        """Get the relative urls of the index files that are no longer listed."""
+        if previous is None:
+            return []
+        return sorted(set(previous.files) - set(self.files))
+
+
+@beartype
+@attrs.frozen
+class DistChanges:
+    """What changed in a distribution since it was last crawled."""
+
+    dist: str
+    is_unchanged: bool
+    """True when the Release file has the same Date as the last crawl."""
+    is_expired: bool = False
+    """True when the Release file's Valid-Until time has passed."""
+    changed: list[str] = attrs.field(factory=list)
+    """The relative urls of the index files that are new or have a different hash."""
+    removed: list[str] = attrs.field(factory=list)
+    """The relative urls of the index files that are no longer listed."""
+    fetched: dict[str, int] = attrs.field(factory=dict)
+    """The status of each changed index file that was downloaded."""
+
+
+@beartype
+class SnapshotStore:
+    """Stores the latest crawl snapshot of each distribution in each repository.
+
+    The snapshots are stored in a sqlite database,
+    so they are kept between runs and shared by all threads and processes using the same file.
+    """
+
+    dist_table = "crawl_snapshot_dist"
+    file_table = "crawl_snapshot_file"
+
+    def __init__(self, db_file: pathlib.Path):
+        self._db = utils.SqliteConnection(db_file)
+
+        with self._db.transaction() as conn:
+            conn.execute(
+                f"CREATE TABLE IF NOT EXISTS {self.dist_table} "
+                "(repo_url TEXT NOT NULL, dist TEXT NOT NULL, "
+                "date TEXT, valid_until TEXT, acquire_by_hash INTEGER NOT NULL, "
+                "updated REAL NOT NULL, PRIMARY KEY (repo_url, dist))"
+            )
+            conn.execute(
+                f"CREATE TABLE IF NOT EXISTS {self.file_table} "
+                "(repo_url TEXT NOT NULL, dist TEXT NOT NULL, path TEXT NOT NULL, "
+                "hash_type INTEGER NOT NULL, hash_value TEXT NOT NULL, "
+                "size_bytes INTEGER NOT NULL, PRIMARY KEY (repo_url, dist, path))"
+            )
+
+    def load(self, repo_url: str) -> dict[str, DistSnapshot]:
+        """Get the snapshots of the distributions in a repository, keyed by distribution."""
+        with self._db.transaction() as conn:
+            dist_rows = conn.execute(
+                "SELECT dist, date, valid_until, acquire_by_hash "
+                f"FROM {self.dist_table} WHERE repo_url = ?",
+                (repo_url,),
+            ).fetchall()
+            file_rows = conn.execute(
+                "SELECT dist, path, hash_type, hash_value, size_bytes "
+                f"FROM {self.file_table} WHERE repo_url = ?",
+                (repo_url,),
+            ).fetchall()
+
+        files: dict[str, dict[str, apt_models.FileInfo]] = {}
+        for dist, path, hash_type, hash_value, size_bytes in file_rows:
+            files.setdefault(dist, {})[path] = apt_models.FileInfo(
+                url_relative=path,
+                hash_type=apt_models.FileHashType(hash_type),
+                hash_value=hash_value,
+                size_bytes=size_bytes,
+            )
+
+        return {
+            dist: DistSnapshot(
+                dist=dist,
+                date=_from_text(date),
+                valid_until=_from_text(valid_until),
+                acquire_by_hash=bool(acquire_by_hash),
+                files=files.get(dist, {}),
+            )
+            for dist, date, valid_until, acquire_by_hash in dist_rows
+        }
+
+    def save(
+        self,
+        repo_url: str,
+        snapshot: DistSnapshot,
+        previous: DistSnapshot | None = None,
+    ) -> None:
+        """Store the snapshot of a distribution.
+        When the previous snapshot is given, only the index files that changed are written."""
+        changed = snapshot.changed_files(previous)
+        removed = snapshot.removed_files(previous) if previous is not None else None
+        now = datetime.datetime.now(datetime.UTC).timestamp()
+        with self._db.transaction() as conn:
+            conn.execute(
+                f"INSERT INTO {self.dist_table} "
+                "(repo_url, dist, date, valid_until, acquire_by_hash, updated) "
+                "VALUES (?, ?, ?, ?, ?, ?) "
+                "ON CONFLICT(repo_url, dist) DO UPDATE SET date = excluded.date, "
+                "valid_until = excluded.valid_until, "
+                "acquire_by_hash = excluded.acquire_by_hash, "
+                "updated = excluded.updated",
+                (
+                    repo_url,
+                    snapshot.dist,
+                    _to_text(snapshot.date),
+                    _to_text(snapshot.valid_until),
+                    int(snapshot.acquire_by_hash),
+                    now,
+                ),
+            )
+            if removed is None:
+                conn.execute(
+                    f"DELETE FROM {self.file_table} WHERE repo_url = ? AND dist = ?",
+                    (repo_url, snapshot.dist),
+                )
+            else:
+                conn.executemany(
+                    f"DELETE FROM {self.file_table} "
+                    "WHERE repo_url = ? AND dist = ? AND path = ?",
+                    [(repo_url, snapshot.dist, path) for path in removed],
+                )
+            conn.executemany(
+                f"INSERT OR REPLACE INTO {self.file_table} "
+                "(repo_url, dist, path, hash_type, hash_value, size_bytes) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                [
+                    (
+                        repo_url,
+                        snapshot.dist,
+                        path,
+                        snapshot.files[path].hash_type.value,
+                        snapshot.files[path].hash_value,
+                        snapshot.files[path].size_bytes,
+                    )
+                    for path in changed
+                ],
+            )
+
+
+def _to_text(value: datetime.datetime | None) -> str | None:
+    return value.isoformat() if value is not None else None
+
+
+def _from_text(value: str | None) -> datetime.datetime | None:
+    return datetime.datetime.fromisoformat(value) if value else None
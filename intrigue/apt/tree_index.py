@@ -0,0 +1,261 @@
+"""Indexes the recursive directory listing (ls-lR) of an APT archive repository."""
+
+import array
+import collections
+import datetime
+import hashlib
+import io
+import logging
+import re
+import sys
+import threading
+import time
+import typing
+
+import attrs
+from beartype import beartype
+
+logger = logging.getLogger(__name__)
+
+RE_MODE: re.Pattern[str] = re.compile(r"^[-dlcbps][-rwxsStT]{9}[.+@]?$")
+
+
+@beartype
+@attrs.frozen
+class TreeEntry:
+    """One item in a directory."""
+
+    name: str
+    is_dir: bool
+    size_bytes: int
+    modified: str
+    """The modified time as shown in the listing, e.g. 'Jun 10 02:31' or 'Jun 10 2021'."""
+    target: str | None = None
+    """The target of a symbolic link."""
+
+    @property
+    def is_link(self) -> bool:
+        return self.target is not None
+
+
+class _Directory:
+    """The entries in one directory, stored in columns."""
+
+    __slots__ = ("kinds", "modified", "names", "sizes", "targets")
+
+    def __init__(self):
+        self.names: list[str] = []
+        self.sizes = array.array("q")
+        self.kinds = bytearray()
+        self.modified: list[str] = []
+        self.targets: dict[int, str] = {}
+
+    def add(self, kind: str, name: str, size: int, modified: str, target: str | None):
+        if target is not None:
+            self.targets[len(self.names)] = target
+        self.names.append(name)
+        self.sizes.append(size)
+        self.kinds.append(ord(kind))
+        # there are few distinct times, so share the strings
+        self.modified.append(sys.intern(modified))
+
+
+@beartype
+class TreeIndex:
+    """A directory tree built from an ls-lR listing.
+
+    The entries in each directory are stored in compact columns,
+    so a listing of a whole archive fits in memory.
+    Paths are relative to the directory containing the listing file,
+    using '/' as the separator and '' for the top directory.
+    """
+
+    def __init__(self):
+        self._dirs: dict[str, _Directory] = {}
+
+    @classmethod
+    def from_lines(cls, lines: typing.Iterable[str]) -> "TreeIndex":
+        """Build an index from the lines of an ls-lR listing, read one line at a time."""
+        index = cls()
+        current: _Directory | None = None
+        for raw_line in lines:
+            line = raw_line.rstrip("\r\n")
+            if not line:
+                current = None
+                continue
+
+            if current is None and line.endswith(":"):
+                current = index._dirs.setdefault(
+                    cls._normalise(line[:-1]), _Directory()
+                )
+                continue
+
+            if current is None or line.startswith("total "):
+                continue
+
+            parts = line.split(None, 8)
+            if len(parts) < 9 or not RE_MODE.match(parts[0]):
+                continue
+            try:
+                size = int(parts[4])
+            except ValueError:
+                # device files show major and minor numbers instead of a size
+                continue
+
+            kind = parts[0][0]
+            name = parts[8]
+            target = None
+            if kind == "l" and " -> " in name:
+                name, target = name.split(" -> ", maxsplit=1)
+            current.add(kind, name, size, " ".join(parts[5:8]), target)
+
+        logger.info("Indexed %s directories from ls-lR listing", len(index._dirs))
+        return index
+
+    @property
+    def directory_count(self) -> int:
+        return len(self._dirs)
+
+    def contains(self, path: str) -> bool:
+        return self._normalise(path) in self._dirs
+
+    def entries(self, path: str) -> list[TreeEntry] | None:
+        """Get the entries in a directory, or None if the directory is not in the index."""
+        directory = self._dirs.get(self._normalise(path))
+        if directory is None:
+            return None
+        return [
+            TreeEntry(
+                name=name,
+                is_dir=directory.kinds[i] == ord("d"),
+                size_bytes=directory.sizes[i],
+                modified=directory.modified[i],
+                target=directory.targets.get(i),
+            )
+            for i, name in enumerate(directory.names)
+        ]
+
+    def links(self, path: str) -> list[str] | None:
+        """Get the sorted links in a directory in the same form as a html listing,
+        where directories end with a slash.
+        Returns None if the directory is not in the index."""
+        directory = self._dirs.get(self._normalise(path))
+        if directory is None:
+            return None
+        return sorted(
+            f"{name}/" if directory.kinds[i] == ord("d") else name
+            for i, name in enumerate(directory.names)
+        )
+
+    @classmethod
+    def _normalise(cls, path: str) -> str:
+        path = path.strip()
+        if path.startswith("./"):
+            path = path[2:]
+        elif path == ".":
+            path = ""
+        return "/".join(p for p in path.split("/") if p)
+
+
+@beartype
+class TreeIndexMemo:
+    """Keeps the indexes built from recent ls-lR listings, keyed by url.
+
+    Urls without a listing are remembered as well,
+    so pages that look for a listing do not request it again each time.
+    After max_ttl the listing is fetched again, usually from the response cache,
+    and the index is only built again when the content of the listing has changed.
+    """
+
+    def __init__(
+        self,
+        max_entries: int = 2,
+        max_missing: int = 256,
+        max_ttl: datetime.timedelta = datetime.timedelta(minutes=10),
+        build_locks: int = 16,
+    ):
+        self._max_entries = max_entries
+        self._max_missing = max_missing
+        self._max_ttl = max_ttl.total_seconds()
+        self._lock = threading.Lock()
+        self._entries: collections.OrderedDict[str, tuple[TreeIndex, str, float]] = (
+            collections.OrderedDict()
+        )
+        self._missing: collections.OrderedDict[str, float] = collections.OrderedDict()
+        self._build_locks = [threading.Lock() for _ in range(build_locks)]
+
+    def get_or_build(
+        self,
+        url: str,
+        fetch: typing.Callable[[], io.IOBase | None],
+        build: typing.Callable[[io.IOBase], TreeIndex | None],
+    ) -> TreeIndex | None:
+        """Get the index for the url, building it if it is not known or has changed.
+        The fetch returns None when the url does not have a listing,
+        and the build returns None when the listing cannot be read."""
+        found, index = self._get(url)
+        if found:
+            return index
+
+        # one caller at a time builds the index for a url
+        with self._build_locks[hash(url) % len(self._build_locks)]:
+            found, index = self._get(url)
+            if found:
+                return index
+
+            stream = fetch()
+            if stream is None:
+                self._put(url, None, "")
+                return None
+
+            with stream:
+                digest = _digest(stream)
+                index = self._unchanged(url, digest)
+                if index is None:
+                    stream.seek(0)
+                    index = build(stream)
+            self._put(url, index, digest)
+        return index
+
+    def _get(self, url: str) -> tuple[bool, TreeIndex | None]:
+        now = time.monotonic()
+        with self._lock:
+            item = self._entries.get(url)
+            if item is not None and item[2] > now:
+                self._entries.move_to_end(url)
+                return True, item[0]
+
+            expires = self._missing.get(url)
+            if expires is not None and expires > now:
+                return True, None
+        return False, None
+
+    def _unchanged(self, url: str, digest: str) -> TreeIndex | None:
+        # an expired index can be used again if the listing is the same
+        with self._lock:
+            item = self._entries.get(url)
+        if item is not None and item[1] == digest:
+            logger.debug("ls-lR listing unchanged %s", url)
+            return item[0]
+        return None
+
+    def _put(self, url: str, index: TreeIndex | None, digest: str) -> None:
+        expires = time.monotonic() + self._max_ttl
+        with self._lock:
+            self._entries.pop(url, None)
+            self._missing.pop(url, None)
+            if index is None:
+                self._missing[url] = expires
+                while len(self._missing) > self._max_missing:
+                    self._missing.popitem(last=False)
+            else:
+                self._entries[url] = (index, digest, expires)
+                while len(self._entries) > self._max_entries:
+                    self._entries.popitem(last=False)
+
+
+def _digest(stream: io.IOBase, chunk_size: int = 1024 * 1024) -> str:
+    digest = hashlib.sha256()
+    while chunk := stream.read(chunk_size):
+        digest.update(chunk)
+    return digest.hexdigest()
@@ -0,0 +1,94 @@
+"""Stores file content by the hash of the content."""
+
+import hashlib
+import io
+import logging
+import os
+import pathlib
+import re
+import tempfile
+import typing
+
+from beartype import beartype
+
+from intrigue.apt.utils import AptException
+
+logger = logging.getLogger(__name__)
+
+RE_SHA256: re.Pattern[str] = re.compile(r"^[0-9a-f]{64}$")
+
+
+@beartype
+class BlobStore:
+    """A content-addressed store of files on disk, keyed by SHA256.
+
+    The same content is only stored once, no matter how many urls it was found at.
+    Content is written to a temporary file and moved into place once its hash is known,
+    so a partly written file is never visible.
+    """
+
+    def __init__(self, root: pathlib.Path):
+        self._root = root
+
+    @property
+    def root(self) -> pathlib.Path:
+        return self._root
+
+    def path(self, sha256: str) -> pathlib.Path:
+        sha256 = self._check(sha256)
+        return self._root / sha256[:2] / sha256
+
+    def contains(self, sha256: str) -> bool:
+        return self.path(sha256).is_file()
+
+    def open(self, sha256: str) -> io.IOBase | None:
+        """Open the stored content for reading, or None if it is not stored."""
+        try:
+            return self.path(sha256).open("rb")
+        except FileNotFoundError:
+            return None
+
+    def put_bytes(self, content: bytes, expected: str | None = None) -> str:
+        """Store the content. Returns the SHA256 of the content."""
+        return self.put_chunks([content], expected)
+
+    def put_chunks(
+        self, chunks: typing.Iterable[bytes], expected: str | None = None
+    ) -> str:
+        """Store the content from an iterable of bytes chunks.
+        Raises an error if the content does not match the expected SHA256.
+        Returns the SHA256 of the content."""
+        if expected is not None:
+            expected = self._check(expected)
+
+        self._root.mkdir(parents=True, exist_ok=True)
+        digest = hashlib.sha256()
+        fd, temp_name = tempfile.mkstemp(dir=self._root, suffix=".partial")
+        temp_path = pathlib.Path(temp_name)
+        try:
+            with os.fdopen(fd, "wb") as f:
+                for chunk in chunks:
+                    digest.update(chunk)
+                    f.write(chunk)
+
+            sha256 = digest.hexdigest()
+            if expected is not None and sha256 != expected:
+                raise AptException(
+                    f"Content hash '{sha256}' does not match expected hash '{expected}'."
+                )
+
+            target = self.path(sha256)
+            if target.exists():
+                logger.debug("Blob already stored: %s", sha256)
+            else:
+                target.parent.mkdir(parents=True, exist_ok=True)
+                os.replace(temp_path, target)
+            return sha256
+        finally:
+            temp_path.unlink(missing_ok=True)
+
+    def _check(self, sha256: str) -> str:
+        value = sha256.strip().lower()
+        if not RE_SHA256.match(value):
+            raise AptException(f"Invalid SHA256 '{sha256}'.")
+        return value
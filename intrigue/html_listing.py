@@ -0,0 +1,152 @@
+"""Parses the links from directory listing pages."""
+
+import collections
+import enum
+import hashlib
+import html as html_lib
+import logging
+import re
+import threading
+import typing
+
+import parsel
+from beartype import beartype
+
+from intrigue.apt.utils import AptException
+
+logger = logging.getLogger(__name__)
+
+PARENT_OPTIONS = {"..", "../", "parent directory"}
+
+RE_ANCHOR: re.Pattern[str] = re.compile(
+    r"<a\s[^>]*?href\s*=\s*(?:\"([^\"]*)\"|'([^']*)'|([^\s>]+))[^>]*>(.*?)</a\s*>",
+    re.IGNORECASE | re.DOTALL,
+)
+RE_TAG: re.Pattern[str] = re.compile(r"<[^>]*>")
+RE_INDEX_TITLE: re.Pattern[str] = re.compile(r"<title>\s*Index of\s", re.IGNORECASE)
+RE_S3_PREFIX: re.Pattern[str] = re.compile(r"<Prefix>(.*?)</Prefix>", re.DOTALL)
+RE_S3_ITEM: re.Pattern[str] = re.compile(
+    r"<Key>(.*?)</Key>|<CommonPrefixes>\s*<Prefix>(.*?)</Prefix>", re.DOTALL
+)
+
+
+@beartype
+@enum.unique
+class ListingFormat(enum.Enum):
+    """Known directory listing page formats."""
+
+    UNKNOWN = "unknown"
+
+    AUTOINDEX = "autoindex"
+    """An 'Index of' page generated by a web server, such as Apache, nginx or Launchpad.
+    Each item is an anchor after the link to the parent directory."""
+
+    S3 = "s3"
+    """An S3 bucket listing, where each item is a key or a common prefix."""
+
+
+@beartype
+def detect_format(html: str) -> ListingFormat:
+    """Recognise the format of a directory listing page from its start."""
+    head = html[:2048]
+    if "<ListBucketResult" in head:
+        return ListingFormat.S3
+
+    if RE_INDEX_TITLE.search(head):
+        return ListingFormat.AUTOINDEX
+    return ListingFormat.UNKNOWN
+
+
+@beartype
+def parse_links(url: str, html: str) -> list[str]:
+    """Get the sorted links to the items in a directory listing page.
+
+    Known formats are read with a single pass over the page.
+    Other pages are parsed into a document, which is slower but more forgiving.
+    Raises an error if the page is not a directory listing."""
+    listing_format = detect_format(html)
+    logger.debug("html listing format %s on %s", listing_format.value, url)
+
+    if listing_format == ListingFormat.S3:
+        return sorted(_s3_links(html))
+
+    if listing_format == ListingFormat.AUTOINDEX:
+        anchors = _regex_anchors(html)
+    else:
+        anchors = _parsel_anchors(html)
+
+    links = []
+    seen_parent = False
+    for link_url, text in anchors:
+        # Links before the link to the parent directory are page navigation,
+        # and links to other sites are not directory items.
+        name = text.strip().casefold()
+        logger.debug("html listing link: %s - %s", name, link_url)
+        if name in PARENT_OPTIONS or link_url in PARENT_OPTIONS:
+            seen_parent = True
+            logger.debug("html listing link parent: %s - %s", name, link_url)
+        elif not seen_parent:
+            logger.debug("html listing link ignore: %s - %s", name, link_url)
+        elif link_url.startswith("http") and not link_url.startswith(url):
+            logger.debug("html listing link ignore external: %s - %s", name, link_url)
+        else:
+            links.append(link_url.strip())
+
+    if not seen_parent:
+        raise AptException("Unknown html directory listing format.")
+    return sorted(links)
+
+
+def _s3_links(html: str) -> typing.Iterator[str]:
+    prefix_match = RE_S3_PREFIX.search(html)
+    prefix = html_lib.unescape(prefix_match.group(1)) if prefix_match else ""
+    for match in RE_S3_ITEM.finditer(html):
+        key = html_lib.unescape(match.group(1) or match.group(2))
+        if key.startswith(prefix) and key != prefix:
+            yield key[len(prefix) :]
+
+
+def _regex_anchors(html: str) -> typing.Iterator[tuple[str, str]]:
+    for match in RE_ANCHOR.finditer(html):
+        href = next(g for g in match.groups()[:3] if g is not None)
+        text = RE_TAG.sub("", match.group(4))
+        yield html_lib.unescape(href), html_lib.unescape(text)
+
+
+def _parsel_anchors(html: str) -> typing.Iterator[tuple[str, str]]:
+    selector = parsel.Selector(text=html)
+    for link in selector.css("a"):
+        href = link.attrib.get("href")
+        if href is None:
+            continue
+        yield href, link.css("::text").get() or ""
+
+
+@beartype
+class ListingMemo:
+    """Remembers the links parsed from recent listing pages,
+    keyed by the url and a hash of the page content."""
+
+    def __init__(self, max_entries: int = 256):
+        self._max_entries = max_entries
+        self._lock = threading.Lock()
+        self._entries: collections.OrderedDict[tuple[str, str], tuple[str, ...]] = (
+            collections.OrderedDict()
+        )
+
+    def links(self, url: str, html: str) -> list[str]:
+        """Get the links in a listing page, parsing the page if it has not been seen."""
+        digest = hashlib.blake2b(html.encode(), digest_size=16).hexdigest()
+        key = (url, digest)
+        with self._lock:
+            links = self._entries.get(key)
+            if links is not None:
+                self._entries.move_to_end(key)
+                return list(links)
+
+        links = tuple(parse_links(url, html))
+        with self._lock:
+            self._entries[key] = links
+            while len(self._entries) > self._max_entries:
+                self._entries.popitem(last=False)
+        return list(links)
@@ -1,22 +1,106 @@
 """Manages web requests."""
 
+import contextlib
 import datetime
+import http
+import io
+import json
 import logging
 import pathlib
-import time
+import tempfile
 import typing
 
 import attrs
-import parsel
+import requests
 import requests_cache
 from beartype import beartype
 
-from intrigue.apt import utils
+from intrigue import (
+    blob_store,
+    html_listing,
+    http_coalesce,
+    http_memory,
+    http_storage,
+    http_throttle,
+)
+from intrigue.apt import landmark, utils
 from intrigue.apt.utils import AptException
 
 logger = logging.getLogger(__name__)
 
 
+@beartype
+@attrs.frozen
+class ExpiryPolicy:
+    """How long cached responses are fresh, by the kind of repository url.
+
+    Expired responses are served while they are revalidated in the background,
+    so a short expiry keeps data current without making the page wait."""
+
+    items: dict[landmark.KnownItem, datetime.timedelta | int] = attrs.field(
+        factory=lambda: {
+            # files at these urls never change, directory listings here still do
+            landmark.KnownItem.BY_HASH: requests_cache.NEVER_EXPIRE,
+            landmark.KnownItem.POOL: requests_cache.NEVER_EXPIRE,
+            # these files change whenever the repository is updated
+            landmark.KnownItem.RELEASE_COMBINED: datetime.timedelta(minutes=30),
+            landmark.KnownItem.RELEASE_CLEAR: datetime.timedelta(minutes=30),
+            landmark.KnownItem.RELEASE_DETACHED: datetime.timedelta(minutes=30),
+            landmark.KnownItem.PACKAGES: datetime.timedelta(hours=6),
+            landmark.KnownItem.CONTENTS: datetime.timedelta(hours=6),
+            landmark.KnownItem.TOP_LISTING: datetime.timedelta(hours=6),
+        }
+    )
+    """The expiry for each kind of repository item."""
+
+    listing: datetime.timedelta | int = datetime.timedelta(hours=6)
+    """The expiry for directory listings."""
+
+    default: datetime.timedelta | int = datetime.timedelta(hours=6)
+    """The expiry for other files, such as translations and icons."""
+
+    negative: datetime.timedelta | int = datetime.timedelta(minutes=10)
+    """The expiry for 'not found' and 'forbidden' responses."""
+
+    probe: datetime.timedelta | int = datetime.timedelta(minutes=10)
+    """The expiry for HEAD responses used to check whether an item exists."""
+
+    def expire_after(self, url: str) -> datetime.timedelta | int:
+        """Get the expiry for the url."""
+        item = landmark.classify(url)
+        immutable = [landmark.KnownItem.BY_HASH, landmark.KnownItem.POOL]
+        if item in immutable and not self.is_immutable(url):
+            # a listing of a pool or by-hash directory changes like any other listing
+            return self.listing
+        if item in self.items:
+            return self.items[item]
+        if self.is_listing(url):
+            return self.listing
+        return self.default
+
+    def is_listing(self, url: str) -> bool:
+        """Does the url look like a directory?"""
+        if url.endswith("/"):
+            return True
+        path = utils.from_url(url).path
+        name = path[-1] if path else ""
+        return "." not in name
+
+    def is_immutable(self, url: str) -> bool:
+        """Is the url a file that never changes once it is published?
+
+        These are the files in a by-hash directory, which are named by their hash,
+        and the package files in the pool, which are named by package and version.
+        Package names cannot contain an underscore, so the directories in the pool,
+        such as 'pool/main/p/python3.11', are never mistaken for files."""
+        if url.endswith("/"):
+            return False
+        path = utils.from_url(url).path or []
+        if len(path) >= 3 and path[-3] == landmark.KnownItem.BY_HASH.value:
+            return True
+        return landmark.KnownItem.POOL.value in path and "_" in path[-1]
+
+
 @beartype
 @attrs.frozen
 class HtmlListing:
@@ -31,46 +115,110 @@ class HtmlListing:
             yield utils.build_url(self.url, [link])
 
 
+@beartype
+@attrs.frozen
+class HtmlListingPage:
+    """One page of the links in a html directory listing."""
+
+    url: str
+    links: list[str]
+
+    after: str | None = None
+    """The link this page starts after, or None for the first page."""
+
+    next_after: str | None = None
+    """The link the next page starts after, or None for the last page."""
+
+    @property
+    def urls(self):
+        for link in self.links:
+            yield utils.build_url(self.url, [link])
+
+
 @beartype
 class HttpClient:
     """A http client and cache using requests_cache."""
 
     _backend_file: pathlib.Path
     _backend: requests_cache.SQLiteCache
+    _store: http_storage.CacheStore
+    """Tracks use of the cached responses and applies the cache size limit."""
 
-    _expire_after: datetime.timedelta
     _session: requests_cache.CachedSession
+    _single_flight: http_coalesce.SingleFlight
+    """Lets one request at a time fetch each url that is not cached."""
+
+    _expiry_policy: ExpiryPolicy
+    """How long each kind of repository url is fresh,
+    before it is served stale and revalidated in the background."""
 
     _throttle_time: datetime.timedelta
+    """The time for a host to regain the budget for one request."""
+    _throttle_burst: int
+    """The number of requests a host can make at once."""
+    _limiter: http_throttle.HostRateLimiter | None
+    _probe_limiter: http_throttle.HostRateLimiter | None
+    """The budget for HEAD requests, which allows a larger burst."""
+
+    _stream_session: requests.Session
+    """A session without a response cache, used to stream large downloads."""
+    _max_in_memory: int
+    """The size in bytes a streamed download can reach before it is spooled to disk."""
+
+    _blobs: blob_store.BlobStore
+    """Downloads with a known SHA256, stored once by their content hash."""
+
+    _memory: http_memory.MemoryCache
+    """Recently used response bodies, so cache hits can skip reading the backend."""
+
+    _listings: html_listing.ListingMemo
+    """The links parsed from recent directory listing pages."""
+
+    _allowable_codes = (200, 404, 403)
 
     user_agent = "repo-browser (+https://github.com/cofiem/repo-browser)"
 
     def __init__(
         self,
         cache_file: typing.Optional[pathlib.Path],
-        expire_after: typing.Optional[datetime.timedelta] = None,
         throttle_time: typing.Optional[datetime.timedelta] = None,
         use_cache_control: bool = False,
+        throttle_burst: int = 1,
+        expiry_policy: ExpiryPolicy | None = None,
+        max_in_memory: int = 8 * 1024 * 1024,
+        memory_cache_bytes: int = 64 * 1024 * 1024,
+        memory_cache_ttl: datetime.timedelta | None = None,
+        cache_max_bytes: int | None = None,
+        probe_burst: int = 16,
     ):
         if not cache_file:
             raise AptException("Cache path must be provided.")
 
         self._backend_file = cache_file
-        self._backend = requests_cache.SQLiteCache(self._backend_file)
+        self._backend = requests_cache.SQLiteCache(
+            self._backend_file,
+            wal=True,
+            serializer=http_storage.compressed_serializer(),
+        )
+        self._store = http_storage.CacheStore(self._backend, max_bytes=cache_max_bytes)
         self._use_cache_control = use_cache_control
 
-        if self._use_cache_control and expire_after is not None:
-            self._expire_after = expire_after
-        elif self._use_cache_control and expire_after is None:
-            self._expire_after = datetime.timedelta(hours=2)
-        else:
-            self._expire_after = requests_cache.NEVER_EXPIRE
+        self._expiry_policy = (
+            expiry_policy if expiry_policy is not None else ExpiryPolicy()
+        )
 
-        self._session = requests_cache.CachedSession(
+        db_path = pathlib.Path(self._backend.db_path)
+        self._single_flight = http_coalesce.SingleFlight(
+            db_path.with_name(f"{db_path.name}.lock")
+        )
+        self._session = http_coalesce.CoalescingSession(
+            single_flight=self._single_flight,
             backend=self._backend,
-            expire_after=self._expire_after,
+            # each request uses the policy's expiry for its url
+            expire_after=self._expiry_policy.default,
             cache_control=self._use_cache_control,
-            allowable_codes=(200, 404, 403),
+            allowable_codes=self._allowable_codes,
+            stale_while_revalidate=True,
         )
 
         self._throttle_time = (
@@ -78,88 +226,261 @@ class HttpClient:
             if throttle_time is not None
             else datetime.timedelta(seconds=1)
         )
+        self._throttle_burst = throttle_burst
+
+        # wait for the host's budget before sending each non-cached request
+        if self._throttle_time.total_seconds() > 0:
+            self._limiter = http_throttle.HostRateLimiter(
+                db_path,
+                rate=1 / self._throttle_time.total_seconds(),
+                burst=self._throttle_burst,
+            )
+            # HEAD probes are small, so a page can check many items at once
+            self._probe_limiter = http_throttle.HostRateLimiter(
+                db_path,
+                rate=1 / self._throttle_time.total_seconds(),
+                burst=probe_burst,
+                table_name="host_probe_rate_limit",
+            )
+        else:
+            self._limiter = None
+            self._probe_limiter = None
+
+        self._stream_session = requests.Session()
+        self._max_in_memory = max_in_memory
+        self._blobs = blob_store.BlobStore(db_path.with_name(f"{db_path.name}.blobs"))
+        self._listings = html_listing.ListingMemo()
+
+        self._memory = http_memory.MemoryCache(
+            max_bytes=memory_cache_bytes,
+            max_ttl=(
+                memory_cache_ttl
+                if memory_cache_ttl is not None
+                else datetime.timedelta(minutes=10)
+            ),
+        )
 
-        def _http_client_make_throttle_hook(timeout_seconds: float):
-            """
-            Make a request hook function
-            that adds a custom delay for non-cached requests
-            """
-
-            def hook(response, *_args, **_kwargs):
-                is_cached = getattr(response, "from_cache", False)
-                if is_cached:
-                    logger.debug(f"From cache {response.status_code}: {response.url}")
-                else:
-                    logger.debug(f"New response {response.status_code}: {response.url}")
-                    time.sleep(timeout_seconds)
-
-                return response
-
-            return hook
+        if self._limiter:
+            adapter = http_throttle.ThrottledAdapter(
+                self._limiter, head_limiter=self._probe_limiter
+            )
+            for session in [self._session, self._stream_session]:
+                session.mount("http://", adapter)
+                session.mount("https://", adapter)
+
+        def _http_client_log_hook(response, *_args, **_kwargs):
+            is_cached = getattr(response, "from_cache", False)
+            if is_cached:
+                logger.debug(f"From cache {response.status_code}: {response.url}")
+            else:
+                logger.debug(f"New response {response.status_code}: {response.url}")
+            return response
 
-        self._session.hooks["response"].append(
-            _http_client_make_throttle_hook(self._throttle_time.total_seconds())
-        )
+        self._session.hooks["response"].append(_http_client_log_hook)
 
     @property
     def session(self) -> requests_cache.CachedSession:
         return self._session
 
-    def get_text(self, url: str) -> tuple[int, str | None]:
-        resp = self.session.get(url)
-        status = resp.status_code
-        self._log(resp)
-        return status, resp.text if status < 400 else None
+    @property
+    def memory_stats(self) -> http_memory.MemoryCacheStats:
+        return self._memory.stats()
 
-    def get_raw(self, url: str) -> tuple[int, bytes | None]:
-        resp = self.session.get(url)
-        status = resp.status_code
-        self._log(resp)
-        return status, resp.content if status < 400 else None
+    @property
+    def cache_store(self) -> http_storage.CacheStore:
+        return self._store
+
+    def get_text(self, url: str) -> tuple[int, str | None]:
+        entry = self._get_entry(url, decode=True)
+        return entry.status, entry.text
+
+    def get_raw(
+        self, url: str, sha256: str | None = None, revalidate: bool = False
+    ) -> tuple[int, bytes | None]:
+        """Get the content at the url.
+
+        Set revalidate to True to check a cached response with the server
+        before using it, instead of serving it while it is refreshed in the background.
+        """
+        if sha256:
+            status, stream = self.get_stream(url, sha256=sha256)
+            if stream is None:
+                return status, None
+            with stream:
+                return status, stream.read()
+
+        entry = self._get_entry(url, revalidate=revalidate)
+        return entry.status, entry.content
 
     def get_json(self, url: str) -> tuple[int, list | dict | None]:
-        resp = self.session.get(url)
-        status = resp.status_code
-        self._log(resp)
-        return status, resp.json() if status < 400 else None
+        entry = self._get_entry(url, decode=True)
+        return entry.status, json.loads(entry.text) if entry.text is not None else None
+
+    def head(self, url: str) -> tuple[int, int | None]:
+        """Check whether the url exists, without downloading it.
+        Returns the status and the size in bytes, if the server provided it.
+        Responses are cached for a short time."""
+        resp = self.session.head(
+            url, allow_redirects=True, expire_after=self._expiry_policy.probe
+        )
+        logger.debug("HEAD %s: %s", resp.status_code, url)
+        length = resp.headers.get("Content-Length", "")
+        return resp.status_code, int(length) if length.isdigit() else None
 
-    def from_html(self, url: str, html: str) -> HtmlListing:
-        selector = parsel.Selector(text=html)
-
-        links = []
-
-        logger.debug("html listing links on %s", url)
-        seen_parent = False
-        options = ["..", "../", "parent directory"]
-        for link in selector.css("a"):
-            name = link.css("::text").get().strip().casefold()
-            link_url = link.attrib["href"]
-            logger.debug("html listing link: %s - %s", name, link_url)
-            if not seen_parent and name not in options and link_url not in options:
-                logger.debug("html listing link ignore: %s - %s", name, link_url)
-                continue
-            elif name in options or link_url in options:
-                seen_parent = True
-                logger.debug("html listing link parent: %s - %s", name, link_url)
-                continue
-            elif link_url.startswith("http") and not link_url.startswith(url):
-                logger.debug(
-                    "html listing link ignore external: %s - %s", name, link_url
+    def get_stream(
+        self,
+        url: str,
+        chunk_size: int = 1024 * 1024,
+        sha256: str | None = None,
+        cache: bool = False,
+    ) -> tuple[int, io.IOBase | None]:
+        """Download the content at the url into a file-like object.
+
+        The content is read in chunks, and is spooled to a temporary file on disk
+        once it is larger than max_in_memory.
+        Streamed content is not stored in the response cache,
+        unless cache is True. Then the response is cached with the expiry for its url,
+        and is revalidated instead of downloaded again.
+
+        When the SHA256 of the content is known, the content store is checked first,
+        so content already downloaded from any url is not downloaded again.
+        Otherwise the content is downloaded, checked against the hash, and stored.
+
+        The caller must close the returned file.
+        """
+        if sha256:
+            return self._get_blob(url, sha256, chunk_size)
+
+        if cache or self.session.cache.contains(url=url):
+            # a cached body is spooled like a download,
+            # and is not kept in the memory cache
+            resp = self._get(url)
+            self._log(resp)
+            if resp.status_code >= 400:
+                return resp.status_code, None
+            return resp.status_code, self._spool(resp.iter_content(chunk_size))
+
+        with self._stream_session.get(url, stream=True) as resp:
+            status = resp.status_code
+            self._log(resp)
+            if status >= 400:
+                return status, None
+            return status, self._spool(resp.iter_content(chunk_size=chunk_size))
+
+    def _spool(self, chunks: typing.Iterable[bytes]) -> io.IOBase:
+        # close the spool if the download fails, otherwise hand it to the caller
+        with contextlib.ExitStack() as stack:
+            spool = stack.enter_context(
+                tempfile.SpooledTemporaryFile(max_size=self._max_in_memory)
+            )
+            for chunk in chunks:
+                spool.write(chunk)
+            stack.pop_all()
+
+        spool.seek(0)
+        return spool
+
+    def _get_blob(
+        self, url: str, sha256: str, chunk_size: int
+    ) -> tuple[int, io.IOBase | None]:
+        stream = self._blobs.open(sha256)
+        if stream is not None:
+            logger.debug("From blob store %s: %s", sha256, url)
+            return http.HTTPStatus.OK, stream
+
+        with self._single_flight.hold(f"blob-{sha256}"):
+            # another caller may have stored the content while this one waited
+            stream = self._blobs.open(sha256)
+            if stream is not None:
+                return http.HTTPStatus.OK, stream
+
+            with self._stream_session.get(url, stream=True) as resp:
+                status = resp.status_code
+                self._log(resp)
+                if status >= 400:
+                    return status, None
+                self._blobs.put_chunks(
+                    resp.iter_content(chunk_size=chunk_size), expected=sha256
                 )
-                continue
-            else:
-                links.append(link_url.strip())
 
-        if seen_parent is not True:
-            raise AptException("Unknown html directory listing format.")
+        return status, self._blobs.open(sha256)
 
-        return HtmlListing(url=url, links=sorted(links))
+    def from_html(self, url: str, html: str) -> HtmlListing:
+        return HtmlListing(url=url, links=self._listings.links(url, html))
+
+    def _get_entry(
+        self, url: str, decode: bool = False, revalidate: bool = False
+    ) -> http_memory.MemoryCacheEntry:
+        entry = None if revalidate else self._memory.get(url)
+        if entry is not None:
+            logger.debug("From memory %s: %s", entry.status, url)
+            # the cached response was used, even though the backend was not read
+            self._store.touch(self._cache_key(url), url)
+            if decode and entry.text is None and entry.content is not None:
+                entry = entry.with_text()
+                self._memory.replace(url, entry)
+            return entry
+
+        resp = self._get(url, revalidate)
+        status = resp.status_code
+        self._log(resp)
+        entry = http_memory.MemoryCacheEntry(
+            status=status,
+            content=resp.content if status < 400 else None,
+            encoding=resp.encoding,
+        )
+        if decode:
+            entry = entry.with_text()
+        self._memory.put(url, entry, getattr(resp, "expires", None))
+        return entry
+
+    def _get(self, url: str, revalidate: bool = False):
+        # Repository urls expire according to the kind of url.
+        # An expired response is served at once while a conditional request
+        # using the stored ETag / Last-Modified refreshes it in the background.
+        # When revalidating, the conditional request is sent before responding.
+        kwargs = {"expire_after": self._expiry_policy.expire_after(url)}
+
+        key = self._cache_key(url)
+        if revalidate:
+            # a response without an ETag or Last-Modified cannot be checked,
+            # so it is requested again
+            cached = self.session.cache.get_response(key)
+            can_check = cached is not None and any(
+                name in cached.headers for name in ("ETag", "Last-Modified")
+            )
+            kwargs["refresh" if can_check else "force_refresh"] = True
+        if self.session.cache.contains(key=key):
+            resp = self.session.get(url, **kwargs)
+        else:
+            # Concurrent requests for a url that is not cached wait for the first request,
+            # then use the response it stored in the cache.
+            with self._single_flight.hold(key):
+                resp = self.session.get(url, **kwargs)
+
+        from_cache = getattr(resp, "from_cache", False)
+        if not from_cache and resp.status_code in (
+            http.HTTPStatus.NOT_FOUND,
+            http.HTTPStatus.FORBIDDEN,
+        ):
+            # missing items are only cached for a short time
+            resp.expires = requests_cache.get_expiration_datetime(
+                self._expiry_policy.negative
+            )
+            self.session.cache.save_response(resp, key, resp.expires)
+
+        if from_cache or resp.status_code in self._allowable_codes:
+            self._store.touch(key, url, stored=not from_cache)
+        return resp
+
+    def _cache_key(self, url: str) -> str:
+        return self.session.cache.create_key(requests.Request("GET", url))
 
     def _log(self, resp):
         logger.warning(
             "GET %s '%s' (%s): %s",
             resp.status_code,
             resp.headers.get("content-type", ""),
-            "cache" if resp.from_cache else "fresh",
+            "cache" if getattr(resp, "from_cache", False) else "fresh",
             resp.url,
         )
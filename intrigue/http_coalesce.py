@@ -0,0 +1,154 @@
+"""Coalesces concurrent web requests for the same url."""
+
+import contextlib
+import logging
+import os
+import pathlib
+import threading
+import typing
+
+import requests_cache
+from beartype import beartype
+
+try:
+    import fcntl
+except ImportError:  # pragma: no cover - not available on Windows
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+
+@beartype
+class SingleFlight:
+    """Allows one caller at a time to work on each key.
+
+    Callers in the same process wait on a lock for each key.
+    Callers in other processes wait on a byte-range lock in a shared lock file,
+    at an offset derived from the key.
+    Where file locks are not available, only callers in the same process wait.
+    """
+
+    _lock_range = 2**31 - 1
+
+    def __init__(self, lock_file: pathlib.Path):
+        self._lock_file = lock_file
+        self._guard = threading.Lock()
+        self._locks = {}
+        self._fd: int | None = None
+        self._fd_pid: int | None = None
+
+    def acquire(self, key: str, blocking: bool = True) -> bool:
+        """Acquire the lock for the key.
+        Returns False if not blocking and another caller holds the lock."""
+        lock = self._ref(key)
+        if not lock.acquire(blocking=blocking):
+            self._unref(key)
+            return False
+
+        try:
+            acquired = self._file_lock(key, blocking)
+        except Exception:
+            lock.release()
+            self._unref(key)
+            raise
+
+        if not acquired:
+            lock.release()
+            self._unref(key)
+        return acquired
+
+    def release(self, key: str) -> None:
+        """Release the lock for the key.
+        The lock can be released by a different thread to the one that acquired it."""
+        with self._guard:
+            lock, _ = self._locks[key]
+        self._file_unlock(key)
+        lock.release()
+        self._unref(key)
+
+    @contextlib.contextmanager
+    def hold(self, key: str, blocking: bool = True) -> typing.Iterator[bool]:
+        """Hold the lock for the key while in the context.
+        Provides False if not blocking and another caller holds the lock."""
+        acquired = self.acquire(key, blocking)
+        try:
+            yield acquired
+        finally:
+            if acquired:
+                self.release(key)
+
+    def _ref(self, key: str):
+        with self._guard:
+            lock, count = self._locks.get(key, (threading.Lock(), 0))
+            self._locks[key] = (lock, count + 1)
+            return lock
+
+    def _unref(self, key: str) -> None:
+        with self._guard:
+            lock, count = self._locks[key]
+            if count <= 1:
+                del self._locks[key]
+            else:
+                self._locks[key] = (lock, count - 1)
+
+    def _offset(self, key: str) -> int:
+        return int.from_bytes(key.encode(), "big") % self._lock_range
+
+    def _lock_fd(self) -> int | None:
+        if fcntl is None:
+            return None
+
+        # File record locks belong to the process,
+        # so keep one open file for each process.
+        # Closing any file for the lock file would release all the locks.
+        with self._guard:
+            if self._fd is None or self._fd_pid != os.getpid():
+                self._fd = os.open(self._lock_file, os.O_RDWR | os.O_CREAT, 0o644)
+                self._fd_pid = os.getpid()
+            return self._fd
+
+    def _file_lock(self, key: str, blocking: bool) -> bool:
+        fd = self._lock_fd()
+        if fd is None:
+            return True
+
+        flags = fcntl.LOCK_EX if blocking else fcntl.LOCK_EX | fcntl.LOCK_NB
+        try:
+            fcntl.lockf(fd, flags, 1, self._offset(key))
+        except BlockingIOError:
+            return False
+        return True
+
+    def _file_unlock(self, key: str) -> None:
+        fd = self._lock_fd()
+        if fd is None:
+            return
+        fcntl.lockf(fd, fcntl.LOCK_UN, 1, self._offset(key))
+
+
+class CoalescingSession(requests_cache.CachedSession):
+    """A cached session that runs at most one background revalidation for each response.
+
+    When a stale response is served, requests_cache starts a thread to refresh it.
+    Without coalescing, every request for a popular stale url would start another refresh.
+    """
+
+    def __init__(self, *args, single_flight: SingleFlight, **kwargs):
+        self._single_flight = single_flight
+        super().__init__(*args, **kwargs)
+
+    def _resend_async(self, request, actions, cached_response, **kwargs):
+        key = actions.cache_key
+        if not self._single_flight.acquire(key, blocking=False):
+            logger.debug("Revalidation already in progress: %s", request.url)
+            return
+
+        def _refresh():
+            try:
+                self._send_and_cache(request, actions, cached_response, **kwargs)
+            finally:
+                self._single_flight.release(key)
+
+        logger.debug("Using stale response while revalidating: %s", request.url)
+        thread = threading.Thread(target=_refresh, daemon=True)
+        thread.start()
@@ -0,0 +1,172 @@
+"""An in-memory cache of response bodies."""
+
+import collections
+import datetime
+import logging
+import threading
+import time
+
+import attrs
+from beartype import beartype
+
+from intrigue.apt.utils import AptException
+
+logger = logging.getLogger(__name__)
+
+
+@beartype
+@attrs.frozen
+class MemoryCacheEntry:
+    """A decoded response body."""
+
+    status: int
+    """The response status code."""
+
+    content: bytes | None
+    """The raw response body, or None for error responses."""
+
+    encoding: str | None
+    """The encoding from the response headers."""
+
+    text: str | None = None
+    """The body decoded to text, once it has been requested."""
+
+    @property
+    def size(self) -> int:
+        """The approximate number of bytes used by the entry."""
+        return len(self.content or b"") + len(self.text or "")
+
+    def with_text(self) -> "MemoryCacheEntry":
+        """Decode the content using the encoding from the response headers.
+
+        Unlike requests.Response.text, the encoding is not guessed from the content
+        when the headers do not give one; repository files are decoded as UTF-8.
+        """
+        if self.text is not None or self.content is None:
+            return self
+
+        encoding = self.encoding or "utf-8"
+        try:
+            text = str(self.content, encoding, errors="replace")
+        except (LookupError, TypeError):
+            text = str(self.content, errors="replace")
+        return attrs.evolve(self, text=text)
+
+
+@beartype
+@attrs.frozen
+class MemoryCacheStats:
+    """The usage of a MemoryCache."""
+
+    hits: int
+    misses: int
+    evictions: int
+    entries: int
+    size_bytes: int
+    max_bytes: int
+
+
+@beartype
+class MemoryCache:
+    """A least-recently-used cache of response bodies, bounded by total size in bytes.
+
+    Each entry expires when the response it came from expires in the backend cache,
+    or after max_ttl, whichever is sooner.
+    The max_ttl bounds how long an entry can be out of date
+    after another process refreshes the backend cache.
+    """
+
+    def __init__(self, max_bytes: int, max_ttl: datetime.timedelta):
+        if max_bytes < 0:
+            raise AptException("Memory cache size cannot be negative.")
+
+        self._max_bytes = max_bytes
+        self._max_ttl = max_ttl.total_seconds()
+        self._lock = threading.Lock()
+        self._entries: collections.OrderedDict[str, tuple[MemoryCacheEntry, float]] = (
+            collections.OrderedDict()
+        )
+        self._size = 0
+        self._hits = 0
+        self._misses = 0
+        self._evictions = 0
+
+    def get(self, key: str) -> MemoryCacheEntry | None:
+        with self._lock:
+            item = self._entries.get(key)
+            if item is not None and item[1] <= time.monotonic():
+                self._remove(key)
+                item = None
+
+            if item is None:
+                self._misses += 1
+                return None
+
+            self._hits += 1
+            self._entries.move_to_end(key)
+            return item[0]
+
+    def put(
+        self,
+        key: str,
+        entry: MemoryCacheEntry,
+        expires: datetime.datetime | None = None,
+    ) -> None:
+        """Store an entry.
+        The expiry is a naive UTC datetime, as used by requests_cache."""
+        ttl = self._max_ttl
+        if expires is not None:
+            if expires.tzinfo is None:
+                expires = expires.replace(tzinfo=datetime.UTC)
+            now = datetime.datetime.now(datetime.UTC)
+            ttl = min(ttl, (expires - now).total_seconds())
+
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+
+            # expired and oversized entries are not stored
+            if ttl <= 0 or entry.size > self._max_bytes:
+                return
+
+            self._entries[key] = (entry, time.monotonic() + ttl)
+            self._size += entry.size
+
+            while self._size > self._max_bytes:
+                oldest = next(iter(self._entries))
+                self._remove(oldest)
+                self._evictions += 1
+
+    def replace(self, key: str, entry: MemoryCacheEntry) -> None:
+        """Replace an entry that is already stored, keeping its expiry."""
+        with self._lock:
+            item = self._entries.get(key)
+            if item is None:
+                return
+            self._size += entry.size - item[0].size
+            self._entries[key] = (entry, item[1])
+
+            while self._size > self._max_bytes:
+                oldest = next(iter(self._entries))
+                self._remove(oldest)
+                self._evictions += 1
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._size = 0
+
+    def stats(self) -> MemoryCacheStats:
+        with self._lock:
+            return MemoryCacheStats(
+                hits=self._hits,
+                misses=self._misses,
+                evictions=self._evictions,
+                entries=len(self._entries),
+                size_bytes=self._size,
+                max_bytes=self._max_bytes,
+            )
+
+    def _remove(self, key: str) -> None:
+        entry, _ = self._entries.pop(key)
+        self._size -= entry.size
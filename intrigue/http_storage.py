@@ -0,0 +1,329 @@
+"""Manages the storage used by the response cache."""
+
+import datetime
+import logging
+import lzma
+import pathlib
+import pickle
+import threading
+import time
+import zlib
+
+import attrs
+import requests_cache
+from beartype import beartype
+from requests_cache.serializers import SerializerPipeline, Stage
+from requests_cache.serializers.preconf import base_stage
+
+from intrigue import utils
+from intrigue.apt import utils as apt_utils
+from intrigue.apt.utils import AptException
+
+logger = logging.getLogger(__name__)
+
+COMPRESSED_MAGIC = (
+    b"\x1f\x8b",  # gzip
+    b"\xfd7zXZ\x00",  # xz
+    b"BZh",  # bzip2
+    b"PK\x03\x04",  # zip
+)
+
+
+@beartype
+@attrs.frozen
+class HostCacheStats:
+    """The cached responses for one host."""
+
+    host: str
+    """The host, or an empty string for responses that have not been used since tracking started."""
+
+    entries: int
+    """The number of cached responses."""
+
+    size_bytes: int
+    """The stored size of the cached responses."""
+
+    last_hit: datetime.datetime | None
+    """The most recent time a response was used."""
+
+    first_hit: datetime.datetime | None
+    """The least recent time a response was used."""
+
+
+@beartype
+@attrs.frozen
+class CacheStats:
+    """The storage used by the response cache."""
+
+    file_size_bytes: int
+    """The size of the cache database file."""
+
+    entries: int
+    """The number of cached responses."""
+
+    size_bytes: int
+    """The stored size of all cached responses."""
+
+    max_bytes: int | None
+    """The size limit for the cached responses, if there is one."""
+
+    hosts: list[HostCacheStats] = attrs.field(factory=list)
+    """The cached responses for each host."""
+
+
+@beartype
+class CacheStore:
+    """Tracks when cached responses are used, and keeps the cache under a size limit.
+
+    When the cached responses are larger than max_bytes,
+    the least recently used responses are removed.
+
+    Cache hits are recorded in memory and written to the database in batches,
+    every flush_every hits or flush_seconds, whichever comes first.
+    Newly stored responses are written straight away.
+    """
+
+    table_name = "http_cache_usage"
+
+    def __init__(
+        self,
+        backend: requests_cache.SQLiteCache,
+        max_bytes: int | None = None,
+        check_every: int = 50,
+        flush_every: int = 100,
+        flush_seconds: float = 30.0,
+    ):
+        if max_bytes is not None and max_bytes < 1:
+            raise AptException("Cache size limit must be at least 1 byte.")
+
+        self._backend = backend
+        self._max_bytes = max_bytes
+        self._check_every = check_every
+        self._writes = 0
+        self._flush_every = flush_every
+        self._flush_seconds = flush_seconds
+        self._pending: dict[str, tuple[str, float]] = {}
+        self._hits = 0
+        self._flushed = time.monotonic()
+        self._lock = threading.Lock()
+
+        with self._connection() as conn:
+            conn.execute(
+                f"CREATE TABLE IF NOT EXISTS {self.table_name} "
+                "(key TEXT PRIMARY KEY, host TEXT NOT NULL, accessed REAL NOT NULL)"
+            )
+            conn.execute(
+                f"CREATE INDEX IF NOT EXISTS {self.table_name}_accessed_idx "
+                f"ON {self.table_name}(accessed)"
+            )
+
+    @property
+    def max_bytes(self) -> int | None:
+        return self._max_bytes
+
+    def touch(self, key: str, url: str, stored: bool = False) -> None:
+        """Record that a cached response was used.
+        Set stored to True when the response was just written to the cache."""
+        host = apt_utils.from_url(url).netloc or ""
+        with self._lock:
+            self._pending[key] = (host, time.time())
+            self._hits += 1
+            flush = (
+                stored
+                or self._hits >= self._flush_every
+                or time.monotonic() - self._flushed >= self._flush_seconds
+            )
+
+            # only check the total size every few writes
+            check = False
+            if stored and self._max_bytes is not None:
+                self._writes += 1
+                check = self._writes >= self._check_every
+                if check:
+                    self._writes = 0
+
+        if flush:
+            self.flush()
+        if check:
+            self.evict()
+
+    def flush(self) -> None:
+        """Write the recorded cache hits to the database."""
+        with self._lock:
+            pending = self._pending
+            self._pending = {}
+            self._hits = 0
+            self._flushed = time.monotonic()
+        if not pending:
+            return
+
+        with self._connection() as conn:
+            conn.executemany(
+                f"INSERT INTO {self.table_name} (key, host, accessed) VALUES (?, ?, ?) "
+                "ON CONFLICT(key) DO UPDATE SET host = excluded.host, "
+                "accessed = MAX(accessed, excluded.accessed)",
+                [(key, host, accessed) for key, (host, accessed) in pending.items()],
+            )
+
+    def evict(self) -> int:
+        """Remove the least recently used responses until the cache is under the size limit.
+        Returns the number of responses removed."""
+        if self._max_bytes is None:
+            return 0
+
+        self.flush()
+        responses = self._backend.responses.table_name
+        with self._connection() as conn:
+            total = conn.execute(
+                f"SELECT COALESCE(SUM(LENGTH(value)), 0) FROM {responses}"
+            ).fetchone()[0]
+            if total <= self._max_bytes:
+                return 0
+
+            keys = []
+            rows = conn.execute(
+                f"SELECT r.key, LENGTH(r.value) FROM {responses} r "
+                f"LEFT JOIN {self.table_name} u ON r.key = u.key "
+                "ORDER BY COALESCE(u.accessed, 0) ASC"
+            )
+            for key, size in rows:
+                if total <= self._max_bytes:
+                    break
+                keys.append(key)
+                total -= size or 0
+
+        self._delete(keys)
+        logger.info("Removed %s least recently used cached responses", len(keys))
+        return len(keys)
+
+    def compact(self, expired: bool = False) -> int:
+        """Remove usage records for responses no longer in the cache,
+        apply the size limit, and reclaim unused space in the database file.
+        Set expired to True to also remove expired responses,
+        which would otherwise be revalidated when they are next used.
+        Returns the number of responses removed."""
+        before = self._backend.responses.count()
+        if expired:
+            self._backend.delete(expired=True, vacuum=False)
+
+        self.flush()
+        responses = self._backend.responses.table_name
+        with self._connection() as conn:
+            conn.execute(
+                f"DELETE FROM {self.table_name} "
+                f"WHERE key NOT IN (SELECT key FROM {responses})"
+            )
+
+        self.evict()
+        self._backend.responses.vacuum()
+        return before - self._backend.responses.count()
+
+    def stats(self) -> CacheStats:
+        self.flush()
+        responses = self._backend.responses.table_name
+        with self._connection() as conn:
+            rows = conn.execute(
+                "SELECT COALESCE(u.host, ''), COUNT(*), "
+                "COALESCE(SUM(LENGTH(r.value)), 0), MAX(u.accessed), MIN(u.accessed) "
+                f"FROM {responses} r LEFT JOIN {self.table_name} u ON r.key = u.key "
+                "GROUP BY COALESCE(u.host, '') ORDER BY 3 DESC"
+            ).fetchall()
+
+        hosts = [
+            HostCacheStats(
+                host=host,
+                entries=entries,
+                size_bytes=size_bytes,
+                last_hit=self._to_datetime(last_hit),
+                first_hit=self._to_datetime(first_hit),
+            )
+            for host, entries, size_bytes, last_hit, first_hit in rows
+        ]
+        db_path = pathlib.Path(self._backend.db_path)
+        return CacheStats(
+            file_size_bytes=db_path.stat().st_size if db_path.exists() else 0,
+            entries=sum(i.entries for i in hosts),
+            size_bytes=sum(i.size_bytes for i in hosts),
+            max_bytes=self._max_bytes,
+            hosts=hosts,
+        )
+
+    def _delete(self, keys: list[str]) -> None:
+        if not keys:
+            return
+        self._backend.delete(*keys, vacuum=False)
+        with self._connection() as conn:
+            conn.executemany(
+                f"DELETE FROM {self.table_name} WHERE key = ?", [(k,) for k in keys]
+            )
+
+    def _connection(self):
+        # share the cache's connection and write lock
+        return self._backend.responses.connection(commit=True)
+
+    def _to_datetime(self, value: float | None) -> datetime.datetime | None:
+        if value is None:
+            return None
+        return datetime.datetime.fromtimestamp(value, tz=datetime.UTC)
+
+
+@beartype
+class BodyCompressionStage:
+    """A serializer stage that compresses response bodies.
+
+    Small bodies use fast zlib compression, large bodies use stronger lzma compression.
+    Bodies that are already compressed, or too small to benefit, are stored as they are.
+    Responses stored before compression was added are read as they are.
+    """
+
+    codec_key = "_content_codec"
+
+    def __init__(self, min_bytes: int = 512, large_bytes: int = 1024 * 1024):
+        self.min_bytes = min_bytes
+        self.large_bytes = large_bytes
+
+    def dumps(self, value: dict) -> dict:
+        content = value.get("_content")
+        if not content or len(content) < self.min_bytes:
+            return value
+        if self._is_compressed(value.get("url") or "", content):
+            return value
+
+        if len(content) < self.large_bytes:
+            codec, compressed = "zlib", zlib.compress(content, 1)
+        else:
+            codec, compressed = "lzma", lzma.compress(content, preset=1)
+
+        if len(compressed) >= len(content):
+            return value
+        return {**value, "_content": compressed, self.codec_key: codec}
+
+    def loads(self, value: dict) -> dict:
+        codec = value.get(self.codec_key)
+        if codec is None:
+            return value
+
+        value = {k: v for k, v in value.items() if k != self.codec_key}
+        if codec == "zlib":
+            value["_content"] = zlib.decompress(value["_content"])
+        elif codec == "lzma":
+            value["_content"] = lzma.decompress(value["_content"])
+        else:
+            raise AptException(f"Unknown cache body codec '{codec}'.")
+        return value
+
+    def _is_compressed(self, url: str, content: bytes) -> bool:
+        path = apt_utils.from_url(url).path if url else []
+        name = path[-1] if path else ""
+        if any(name.endswith(ext) for ext in utils.archive_extensions("")):
+            return True
+        return content.startswith(COMPRESSED_MAGIC)
+
+
+def compressed_serializer() -> SerializerPipeline:
+    """A pickle serializer that stores compressed response bodies."""
+    return SerializerPipeline(
+        [base_stage, BodyCompressionStage(), Stage(pickle)],
+        name="pickle-compressed",
+        is_binary=True,
+    )
@@ -0,0 +1,133 @@
+"""Limits the rate of web requests to each host."""
+
+import logging
+import pathlib
+import time
+from urllib.parse import urlsplit
+
+import requests
+from beartype import beartype
+from requests.adapters import HTTPAdapter
+
+from intrigue import utils
+from intrigue.apt.utils import AptException
+
+logger = logging.getLogger(__name__)
+
+
+@beartype
+class HostRateLimiter:
+    """A token bucket for each host.
+
+    Each host can make up to 'burst' requests at once,
+    then the bucket refills at 'rate' requests per second.
+    The bucket state is stored in a sqlite database,
+    so the budget for a host is shared by all threads and processes using the same file.
+    Limiters with a different table name have separate budgets.
+    """
+
+    table_name = "host_rate_limit"
+
+    def __init__(
+        self,
+        db_file: pathlib.Path,
+        rate: float,
+        burst: int = 1,
+        table_name: str | None = None,
+    ):
+        if rate <= 0:
+            raise AptException("Rate must be greater than 0.")
+        if burst < 1:
+            raise AptException("Burst must be at least 1.")
+
+        if table_name is not None:
+            self.table_name = table_name
+
+        self._db = utils.SqliteConnection(db_file)
+        self._rate = float(rate)
+        self._burst = burst
+
+        with self._db.transaction() as conn:
+            conn.execute(
+                f"CREATE TABLE IF NOT EXISTS {self.table_name} "
+                "(host TEXT PRIMARY KEY, tokens REAL NOT NULL, updated REAL NOT NULL)"
+            )
+
+    @property
+    def rate(self) -> float:
+        return self._rate
+
+    @property
+    def burst(self) -> int:
+        return self._burst
+
+    def acquire(self, host: str) -> float:
+        """Take one token for the host, waiting until one is available.
+        Returns the number of seconds spent waiting."""
+        waited = 0.0
+        while True:
+            wait = self._take(host)
+            if wait <= 0:
+                if waited > 0:
+                    logger.debug("Waited %.2fs for host %s", waited, host)
+                return waited
+            time.sleep(wait)
+            waited += wait
+
+    def _take(self, host: str) -> float:
+        """Try to take a token.
+        Returns 0 if a token was taken, otherwise the seconds until one is available."""
+        now = time.time()
+        with self._db.transaction() as conn:
+            row = conn.execute(
+                f"SELECT tokens, updated FROM {self.table_name} WHERE host = ?",
+                (host,),
+            ).fetchone()
+            if row is None:
+                tokens = float(self._burst)
+            else:
+                tokens, updated = row
+                elapsed = max(0.0, now - updated)
+                tokens = min(float(self._burst), tokens + elapsed * self._rate)
+
+            if tokens >= 1:
+                tokens -= 1
+                wait = 0.0
+            else:
+                wait = (1 - tokens) / self._rate
+
+            conn.execute(
+                f"INSERT INTO {self.table_name} (host, tokens, updated) VALUES (?, ?, ?) "
+                "ON CONFLICT(host) DO UPDATE SET tokens = excluded.tokens, "
+                "updated = excluded.updated",
+                (host, tokens, now),
+            )
+        return wait
+
+
+@beartype
+class ThrottledAdapter(HTTPAdapter):
+    """A transport adapter that waits for the host rate limiter before each request.
+
+    Responses served from the cache never reach the adapter,
+    so only requests that go to the network use the host's budget.
+    HEAD requests use the head limiter when there is one,
+    so probing for many small items does not wait behind downloads."""
+
+    def __init__(
+        self,
+        limiter: HostRateLimiter,
+        head_limiter: HostRateLimiter | None = None,
+        **kwargs,
+    ):
+        self._limiter = limiter
+        self._head_limiter = head_limiter
+        super().__init__(**kwargs)
+
+    def send(self, request: requests.PreparedRequest, **kwargs) -> requests.Response:
+        host = urlsplit(request.url).netloc
+        if request.method == "HEAD" and self._head_limiter is not None:
+            self._head_limiter.acquire(host)
+        else:
+            self._limiter.acquire(host)
+        return super().send(request, **kwargs)
@@ -0,0 +1,87 @@
+import datetime
+import http.server
+import pathlib
+import tempfile
+import threading
+import time
+import unittest
+
+from intrigue.http_client import HttpClient
+
+
+class _Handler(http.server.BaseHTTPRequestHandler):
+    routes: dict[str, tuple[int, dict[str, str], bytes]]
+    requests: list[tuple[str, str]]
+    statuses: list[int]
+    delays: dict[str, float]
+
+    def do_GET(self):
+        self._respond(include_body=True)
+
+    def do_HEAD(self):
+        self._respond(include_body=False)
+
+    def _respond(self, include_body: bool):
+        self.requests.append((self.command, self.path))
+        time.sleep(self.delays.get(self.path, 0))
+        status, headers, body = self.routes.get(self.path, (404, {}, b"not found"))
+        etag = headers.get("ETag")
+        if etag and self.headers.get("If-None-Match") == etag:
+            status, body = 304, b""
+        self.statuses.append(status)
+        self.send_response(status)
+        for key, value in headers.items():
+            self.send_header(key, value)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        if include_body:
+            self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+class HttpServerTestCase(unittest.TestCase):
+    """Serve fixed responses from a local http server."""
+
+    def setUp(self):
+        handler = type(
+            "Handler",
+            (_Handler,),
+            {"routes": {}, "requests": [], "statuses": [], "delays": {}},
+        )
+        self.handler = handler
+        self.server = http.server.ThreadingHTTPServer(("127.0.0.1", 0), handler)
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        self.thread.start()
+        self.base_url = f"http://127.0.0.1:{self.server.server_port}"
+
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.cache_file = pathlib.Path(self.temp_dir.name) / "http_cache.sqlite3"
+
+    def tearDown(self):
+        self.server.shutdown()
+        self.server.server_close()
+        self.temp_dir.cleanup()
+
+    def add_route(
+        self,
+        path: str,
+        body: bytes,
+        status: int = 200,
+        headers: dict[str, str] | None = None,
+        delay: float = 0,
+    ):
+        self.handler.routes[path] = (status, headers or {}, body)
+        self.handler.delays[path] = delay
+
+    def make_client(self, **kwargs) -> HttpClient:
+        kwargs.setdefault("throttle_time", datetime.timedelta(seconds=0))
+        return HttpClient(cache_file=self.cache_file, **kwargs)
+
+
+LISTING_HTML = b"""<html><body><h1>Index of /dists/</h1>
+<a href="../">../</a>
+<a href="focal/">focal/</a>
+<a href="jammy/">jammy/</a>
+</body></html>"""
@@ -0,0 +1,76 @@
+import gzip
+import io
+import pathlib
+import tempfile
+import unittest
+
+from intrigue.apt.contents import (
+    ContentsEntry,
+    ContentsIndex,
+    ContentsIndexStore,
+    iter_entries,
+    parse_line,
+)
+
+CONTENTS = b"""usr/bin/ls                                          utils/coreutils
+usr/share/doc/my file.txt                           doc/one,universe/doc/two
+/usr/bin/python3                                    python/python3-minimal
+usr/lib/python3/ls                                  python/python3-extra
+"""
+
+OLD_CONTENTS = b"""This file maps each file available in the Debian GNU/Linux system to
+the package from which it originates.
+
+FILE                                                    LOCATION
+usr/bin/ls                                          utils/coreutils
+"""
+
+
+class TestContents(unittest.TestCase):
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.root = pathlib.Path(self.temp_dir.name)
+
+    def tearDown(self):
+        self.temp_dir.cleanup()
+
+    def test_parse(self):
+        self.assertEqual(
+            parse_line("usr/share/doc/my file.txt   doc/one,universe/doc/two\n"),
+            ContentsEntry(
+                path="usr/share/doc/my file.txt",
+                locations=["doc/one", "universe/doc/two"],
+            ),
+        )
+        self.assertIsNone(parse_line("\n"))
+        self.assertEqual(
+            [i.path for i in iter_entries(OLD_CONTENTS.splitlines())], ["usr/bin/ls"]
+        )
+
+    def test_index(self):
+        with gzip.open(io.BytesIO(gzip.compress(CONTENTS))) as lines:
+            index = ContentsIndex.build(lines, self.root / "one.index")
+        index.close()
+
+        with ContentsIndex(self.root / "one.index") as index:
+            self.assertEqual(len(index), 4)
+            self.assertEqual(index.lookup("/usr/bin/ls").packages, ["coreutils"])
+            self.assertEqual(
+                index.lookup("usr/share/doc/my file.txt").packages, ["one", "two"]
+            )
+            self.assertEqual(
+                index.lookup("usr/bin/python3").locations, ["python/python3-minimal"]
+            )
+            self.assertIsNone(index.lookup("usr/bin/missing"))
+            self.assertEqual(
+                [i.path for i in index.search_name("ls")],
+                ["usr/bin/ls", "usr/lib/python3/ls"],
+            )
+            self.assertEqual(index.search_name("missing"), [])
+
+    def test_store(self):
+        store = ContentsIndexStore(self.root / "store")
+        self.assertIsNone(store.open("sha256-abc"))
+        store.build("sha256-abc", CONTENTS.splitlines(keepends=True)).close()
+        with store.open("sha256-abc") as index:
+            self.assertEqual(len(index), 4)
@@ -0,0 +1,114 @@
+import bz2
+import gzip
+import io
+import lzma
+import pathlib
+import tempfile
+import unittest
+
+from intrigue.apt.deb822 import RawParagraph, iter_paragraphs
+from intrigue.apt.models import Field, Paragraph
+from intrigue.apt.utils import AptException
+
+PACKAGES = b"""Package: one
+Version: 1.0
+Description: the first
+ package in the index
+ .
+ with more detail
+
+# a comment between paragraphs
+
+Package: two
+Version: 2.0\r
+Depends: one (>= 1.0),
+ three
+\t
+Package: three
+Version: 3.0
+"""
+
+
+class TestDeb822(unittest.TestCase):
+    def test_paragraphs(self):
+        items = list(iter_paragraphs(PACKAGES))
+        self.assertEqual([i.get("Package") for i in items], ["one", "two", "three"])
+        self.assertEqual(items[1].get("version"), "2.0")
+        self.assertEqual(items[1].values("Depends"), ["one (>= 1.0),", "three"])
+        self.assertEqual(
+            items[0].to_paragraph(),
+            Paragraph(
+                fields=[
+                    Field(name="Package", values=["one"]),
+                    Field(name="Version", values=["1.0"]),
+                    Field(
+                        name="Description",
+                        values=[
+                            "the first",
+                            "package in the index",
+                            ".",
+                            "with more detail",
+                        ],
+                    ),
+                ]
+            ),
+        )
+        self.assertIsNone(items[2].get("Depends"))
+        self.assertNotIn("Depends", items[2])
+
+    def test_sources(self):
+        expected = [i.to_paragraph() for i in iter_paragraphs(PACKAGES)]
+
+        # decompressed streams are read in chunks
+        with lzma.LZMAFile(io.BytesIO(lzma.compress(PACKAGES))) as stream:
+            for size in [1, 5, 1024]:
+                with self.subTest(size=size):
+                    stream.seek(0)
+                    items = iter_paragraphs(stream, chunk_size=size)
+                    self.assertEqual([i.to_paragraph() for i in items], expected)
+
+        # files on disk are memory mapped
+        with tempfile.TemporaryDirectory() as temp_dir:
+            path = pathlib.Path(temp_dir) / "Packages"
+            path.write_bytes(PACKAGES)
+            with path.open("rb") as f:
+                items = [i.to_paragraph() for i in iter_paragraphs(f)]
+            self.assertEqual(items, expected)
+
+            path.write_bytes(b"")
+            with path.open("rb") as f:
+                self.assertEqual(list(iter_paragraphs(f)), [])
+
+    def test_compressed_files(self):
+        expected = [i.to_paragraph() for i in iter_paragraphs(PACKAGES)]
+
+        # the decompressed content is read, not the compressed file on disk
+        with tempfile.TemporaryDirectory() as temp_dir:
+            for module in [lzma, gzip, bz2]:
+                with self.subTest(module=module.__name__):
+                    path = pathlib.Path(temp_dir) / f"Packages.{module.__name__}"
+                    with module.open(path, "wb") as f:
+                        f.write(PACKAGES)
+                    with module.open(path, "rb") as f:
+                        items = [i.to_paragraph() for i in iter_paragraphs(f)]
+                    self.assertEqual(items, expected)
+
+    def test_spooled_file(self):
+        expected = [i.to_paragraph() for i in iter_paragraphs(PACKAGES)]
+        with tempfile.SpooledTemporaryFile(max_size=1024 * 1024) as f:
+            f.write(PACKAGES)
+            f.seek(0)
+            items = [i.to_paragraph() for i in iter_paragraphs(f)]
+            self.assertEqual(items, expected)
+            self.assertFalse(f._rolled)
+
+    def test_repeated_field(self):
+        paragraph = RawParagraph(b"Package: one\nVersion: 1.0\npackage: two")
+        self.assertEqual(paragraph.get("Package"), "one")
+        self.assertEqual(paragraph.names, ["Package", "Version"])
+
+    def test_invalid(self):
+        with self.assertRaisesRegex(AptException, "Invalid paragraph line 'oops'."):
+            RawParagraph(b"oops\nPackage: one")
+        with self.assertRaisesRegex(AptException, "Invalid paragraph line 'oops'."):
+            RawParagraph(b"Package: one\noops").values("Package")
@@ -0,0 +1,405 @@
+import datetime
+import gzip
+import hashlib
+import lzma
+import time
+
+from intrigue.apt import find, snapshot
+from intrigue.apt.landmark import KnownItem
+from intrigue.apt.operations import parse_repository
+from intrigue.http_client import HttpClient
+from intrigue.tests.http_server import HttpServerTestCase
+
+
+def _listing(*links: str) -> bytes:
+    anchors = "".join(f'<a href="{link}">{link}</a>\n' for link in ["../", *links])
+    return f"<html><body><pre>{anchors}</pre></body></html>".encode()
+
+
+IN_RELEASE = b"""-----BEGIN PGP SIGNED MESSAGE-----
+Hash: SHA512
+
+Origin: Ubuntu
+Label: Ubuntu
+Suite: focal
+Version: 20.04
+Codename: focal
+Date: Thu, 23 Apr 2020 17:33:17 UTC
+Architectures: amd64 i386 all
+Components: main restricted
+Description: Ubuntu Focal 20.04
+MD5Sum:
+ 0f1f3e3b8bbb9b0a3a7ba49f0bc1e3c1 1024 main/binary-amd64/Packages
+SHA256:
+ 1e0ee3b5b2b8fc7c8e7b9d8f6c6a8c6e1e0ee3b5b2b8fc7c8e7b9d8f6c6a8c6e 1024 main/binary-amd64/Packages
+ 2e0ee3b5b2b8fc7c8e7b9d8f6c6a8c6e1e0ee3b5b2b8fc7c8e7b9d8f6c6a8c6e 256 main/binary-amd64/Packages.xz
+-----BEGIN PGP SIGNATURE-----
+
+aGVsbG8=
+-----END PGP SIGNATURE-----
+"""
+
+
+class TestRepositoryCrawler(HttpServerTestCase):
+    def setUp(self):
+        super().setUp()
+        self.add_route("/repo/dists/", _listing("focal/", "jammy/", "README"))
+        for dist in ["focal", "jammy"]:
+            self.add_route(
+                f"/repo/dists/{dist}/",
+                _listing("main/", "universe/", "InRelease", "by-hash/"),
+            )
+            for comp in ["main", "universe"]:
+                self.add_route(
+                    f"/repo/dists/{dist}/{comp}/",
+                    _listing("binary-amd64/", "binary-arm64/", "i18n/", "source/"),
+                )
+        self.add_route("/repo/dists/jammy/InRelease", b"release")
+
+    def test_walks_once(self):
+        repo = parse_repository(url=f"{self.base_url}/repo/")
+        crawler = find.RepositoryCrawler(self.make_client(), repo, use_release=False)
+
+        self.assertEqual(crawler.architectures(), ["amd64", "arm64"])
+        self.assertEqual(crawler.components(), ["main", "universe"])
+        self.assertEqual(crawler.distributions(), ["focal", "jammy"])
+
+        # dists, each dist, and each dist and component
+        self.assertEqual(crawler.request_count, 1 + 2 + 4)
+        self.assertEqual(len(self.handler.requests), 1 + 2 + 4)
+
+    def test_concurrent_levels(self):
+        for dist in ["focal", "jammy"]:
+            for comp in ["main", "universe"]:
+                path = f"/repo/dists/{dist}/{comp}/"
+                self.handler.delays[path] = 0.4
+        repo = parse_repository(url=f"{self.base_url}/repo/")
+
+        crawler = find.RepositoryCrawler(
+            self.make_client(), repo, max_workers=4, use_release=False
+        )
+        start = time.monotonic()
+        self.assertEqual(crawler.architectures(), ["amd64", "arm64"])
+        self.assertLess(time.monotonic() - start, 1.2)
+
+        # one request to the host at a time
+        crawler = find.RepositoryCrawler(
+            HttpClient(
+                cache_file=self.cache_file.with_name("other.sqlite3"),
+                throttle_time=datetime.timedelta(seconds=0),
+            ),
+            repo,
+            host_concurrency=1,
+            use_release=False,
+        )
+        start = time.monotonic()
+        self.assertEqual(crawler.architectures(), ["amd64", "arm64"])
+        self.assertGreaterEqual(time.monotonic() - start, 1.6)
+
+    def test_release_discovery(self):
+        self.add_route("/repo/dists/focal/InRelease", IN_RELEASE)
+        repo = parse_repository(url=f"{self.base_url}/repo/")
+        crawler = find.RepositoryCrawler(self.make_client(), repo)
+
+        # focal is read from its Release file, jammy from the directory listings
+        self.assertEqual(crawler.components(), ["main", "restricted", "universe"])
+        self.assertEqual(crawler.architectures(), ["amd64", "arm64", "i386"])
+        self.assertNotIn(("GET", "/repo/dists/focal/main/"), self.handler.requests)
+        self.assertIn(("GET", "/repo/dists/jammy/main/"), self.handler.requests)
+
+        self.assertEqual(
+            [(i.url_relative, i.hash_type.name) for i in crawler.index_files("focal")],
+            [
+                ("main/binary-amd64/Packages", "Sha256"),
+                ("main/binary-amd64/Packages.xz", "Sha256"),
+            ],
+        )
+
+    def test_tree_index(self):
+        ls_lr = b"""./dists:
+drwxr-sr-x 3 1 1 4096 Jun 10 02:31 bookworm
+
+./dists/bookworm:
+drwxr-sr-x 3 1 1 4096 Jun 10 02:31 main
+-rw-r--r-- 1 1 1 1234 Jun 10 02:31 InRelease
+"""
+        self.add_route("/repo/ls-lR.gz", gzip.compress(ls_lr))
+        client = self.make_client()
+
+        page = find.get_tree_page(client, f"{self.base_url}/repo/dists/bookworm/")
+        self.assertEqual(page.links, ["InRelease", "main/"])
+
+        repo = parse_repository(url=f"{self.base_url}/repo/")
+        crawler = find.RepositoryCrawler(
+            client, repo, use_release=False, use_tree_index=True
+        )
+        self.assertEqual(crawler.components(), ["main"])
+        self.assertFalse(
+            any(p.startswith("/repo/dists") for _, p in self.handler.requests)
+        )
+
+        # the listing is kept in the response cache
+        self.assertTrue(
+            client.session.cache.contains(url=f"{self.base_url}/repo/ls-lR.gz")
+        )
+
+    def test_tree_index_missing(self):
+        client = self.make_client()
+        url = f"{self.base_url}/repo/dists/bookworm/"
+
+        self.assertIsNone(find.get_tree_page(client, url))
+        requested = [p for _, p in self.handler.requests if p.endswith("ls-lR.gz")]
+        self.assertEqual(len(requested), 4)
+
+        # urls without a listing are remembered, and cached like other missing items
+        self.assertIsNone(find.get_tree_page(client, url))
+        self.assertEqual(len(self.handler.requests), 4)
+        self.assertTrue(client.session.cache.contains(url=f"{self.base_url}/ls-lR.gz"))
+
+    def test_releases_probed_at_once(self):
+        self.add_route("/repo/dists/focal/InRelease", IN_RELEASE, delay=0.4)
+        self.add_route("/repo/dists/jammy/InRelease", b"", status=404, delay=0.4)
+        self.add_route("/repo/dists/jammy/Release.gpg", b"signature", delay=0.4)
+        self.add_route("/repo/dists/jammy/Release", b"release", delay=0.4)
+        repo = parse_repository(url=f"{self.base_url}/repo/")
+        crawler = find.RepositoryCrawler(self.make_client(), repo)
+
+        start = time.monotonic()
+        releases = crawler.releases()
+        self.assertLess(time.monotonic() - start, 0.8)
+
+        self.assertEqual(list(releases["focal"].keys()), ["InRelease"])
+        self.assertEqual(list(releases["jammy"].keys()), ["Release.gpg", "Release"])
+
+    def test_probe_landmarks(self):
+        self.add_route("/repo/dists/jammy/InRelease", b"release")
+        self.add_route("/repo/dists/jammy/main/binary-amd64/Packages.xz", b"x" * 10)
+        repo = parse_repository(
+            url=f"{self.base_url}/repo/",
+            distribution="jammy",
+            component="main",
+            architecture="amd64",
+        )
+        crawler = find.RepositoryCrawler(self.make_client(), repo)
+
+        found = {
+            (i.landmark.name, i.url.removeprefix(self.base_url), i.size_bytes)
+            for i in crawler.probe_landmarks()
+        }
+        self.assertEqual(
+            found,
+            {
+                (
+                    KnownItem.DISTS,
+                    "/repo/dists/",
+                    len(_listing("focal/", "jammy/", "README")),
+                ),
+                (KnownItem.RELEASE_COMBINED, "/repo/dists/jammy/InRelease", 7),
+                (
+                    KnownItem.PACKAGES,
+                    "/repo/dists/jammy/main/binary-amd64/Packages.xz",
+                    10,
+                ),
+            },
+        )
+        self.assertTrue(all(method == "HEAD" for method, _ in self.handler.requests))
+
+        # the results are cached for a short time
+        count = len(self.handler.requests)
+        find.RepositoryCrawler(self.make_client(), repo).probe_landmarks()
+        self.assertEqual(len(self.handler.requests), count)
+
+    def test_releases(self):
+        repo = parse_repository(url=f"{self.base_url}/repo/", distribution="jammy")
+        crawler = find.RepositoryCrawler(self.make_client(), repo)
+
+        releases = crawler.releases()
+        self.assertEqual(
+            releases["jammy"]["InRelease"]["url"],
+            f"{self.base_url}/repo/dists/jammy/InRelease",
+        )
+        self.assertIs(crawler.release("jammy"), releases["jammy"])
+
+    def test_package_table(self):
+        packages = b"".join(
+            b"Package: pkg%d\nArchitecture: amd64\nVersion: 1.%d\n"
+            b"Filename: pool/main/p/pkg%d.deb\nSize: %d\n\n" % (i, i, i, i)
+            for i in range(500)
+        )
+        compressed = {
+            "main/binary-amd64/Packages.xz": lzma.compress(packages),
+            "main/binary-amd64/Packages.gz": gzip.compress(packages),
+        }
+        release = [
+            "Origin: Example",
+            "Label: Example",
+            "Suite: focal",
+            "Date: Thu, 23 Apr 2020 17:33:17 UTC",
+            "Components: main",
+            "Architectures: amd64",
+            "SHA256:",
+        ]
+        for path, content in compressed.items():
+            sha256 = hashlib.sha256(content).hexdigest()
+            release.append(f" {sha256} {len(content)} {path}")
+            self.add_route(f"/repo/dists/focal/{path}", content)
+        self.add_route("/repo/dists/focal/InRelease", b"", status=404)
+        self.add_route("/repo/dists/focal/Release", "\n".join(release).encode())
+        self.add_route("/repo/dists/focal/Release.gpg", b"signature")
+
+        repo = parse_repository(url=f"{self.base_url}/repo/", distribution="focal")
+        client = self.make_client()
+        crawler = find.RepositoryCrawler(client, repo)
+        for file_info in crawler.index_files("focal"):
+            with self.subTest(path=file_info.url_relative):
+                table = find.package_table(client, repo, "focal", file_info)
+                self.assertEqual(len(table), 500)
+                [package] = table.lookup("pkg321")
+                self.assertEqual(
+                    (package.version, package.filename, package.size_bytes),
+                    ("1.321", "pool/main/p/pkg321.deb", 321),
+                )
+
+    def test_refresh(self):
+        def _release(date: str, packages: bytes, valid_until: str = "") -> bytes:
+            lines = [
+                "Origin: Example",
+                "Label: Example",
+                "Suite: focal",
+                f"Date: {date}",
+                *([f"Valid-Until: {valid_until}"] if valid_until else []),
+                "Acquire-By-Hash: yes",
+                "Components: main",
+                "Architectures: amd64",
+                "SHA256:",
+                f" {hashlib.sha256(b'').hexdigest()} 0 main/binary-amd64/Packages",
+                (
+                    f" {hashlib.sha256(packages).hexdigest()} {len(packages)} "
+                    "main/binary-amd64/Packages.xz"
+                ),
+            ]
+            return "\n".join(lines).encode() + b"\n"
+
+        def _by_hash(content: bytes) -> str:
+            sha256 = hashlib.sha256(content).hexdigest()
+            return f"/repo/dists/focal/main/binary-amd64/by-hash/SHA256/{sha256}"
+
+        repo = parse_repository(url=f"{self.base_url}/repo/", distribution="focal")
+        store = snapshot.SnapshotStore(self.cache_file.with_name("snapshot.sqlite3"))
+        old_packages = lzma.compress(b"Package: one\n")
+        self.add_route("/repo/dists/focal/InRelease", b"", status=404)
+        self.add_route(
+            "/repo/dists/focal/Release",
+            _release("Thu, 23 Apr 2020 17:33:17 UTC", old_packages),
+        )
+        self.add_route("/repo/dists/focal/Release.gpg", b"signature")
+        self.add_route(_by_hash(old_packages), old_packages)
+
+        [changes] = find.RepositoryCrawler(self.make_client(), repo).refresh(store)
+        self.assertFalse(changes.is_unchanged)
+        self.assertEqual(
+            changes.changed,
+            ["main/binary-amd64/Packages", "main/binary-amd64/Packages.xz"],
+        )
+        self.assertEqual(changes.fetched, {"main/binary-amd64/Packages.xz": 200})
+        self.assertIn(("GET", _by_hash(old_packages)), self.handler.requests)
+
+        # the same Release file is skipped
+        self.handler.requests.clear()
+        [changes] = find.RepositoryCrawler(self.make_client(), repo).refresh(store)
+        self.assertTrue(changes.is_unchanged)
+        self.assertEqual(changes.fetched, {})
+        self.assertNotIn(("GET", _by_hash(old_packages)), self.handler.requests)
+
+        # only the index that changed is requested
+        new_packages = lzma.compress(b"Package: two\n")
+        self.add_route(
+            "/repo/dists/focal/Release",
+            _release(
+                "Fri, 24 Apr 2020 17:33:17 UTC",
+                new_packages,
+                valid_until="Sat, 25 Apr 2020 17:33:17 UTC",
+            ),
+        )
+        self.add_route(_by_hash(new_packages), new_packages)
+        client = self.make_client()
+        self.assertEqual(
+            client.get_raw(f"{self.base_url}/repo/dists/focal/Release")[1],
+            _release("Thu, 23 Apr 2020 17:33:17 UTC", old_packages),
+        )
+
+        # the cached Release file is checked with the server, so the change is found
+        [changes] = find.RepositoryCrawler(client, repo).refresh(store)
+        self.assertFalse(changes.is_unchanged)
+        self.assertTrue(changes.is_expired)
+        self.assertEqual(changes.changed, ["main/binary-amd64/Packages.xz"])
+        self.assertEqual(changes.fetched, {"main/binary-amd64/Packages.xz": 200})
+
+        stored = store.load(repo.url.url)["focal"]
+        self.assertEqual(stored.valid_until.day, 25)
+        self.assertEqual(
+            stored.files["main/binary-amd64/Packages.xz"].hash_value,
+            hashlib.sha256(new_packages).hexdigest(),
+        )
+
+    def test_refresh_hash_mismatch(self):
+        packages = lzma.compress(b"Package: one\n")
+        release = "\n".join(
+            [
+                "Origin: Example",
+                "Label: Example",
+                "Suite: focal",
+                "Date: Thu, 23 Apr 2020 17:33:17 UTC",
+                "Components: main",
+                "Architectures: amd64",
+                "SHA256:",
+                (
+                    f" {hashlib.sha256(packages).hexdigest()} {len(packages)} "
+                    "main/binary-amd64/Packages.xz"
+                ),
+            ]
+        )
+        repo = parse_repository(url=f"{self.base_url}/repo/", distribution="focal")
+        store = snapshot.SnapshotStore(self.cache_file.with_name("snapshot.sqlite3"))
+        self.add_route("/repo/dists/focal/InRelease", b"", status=404)
+        self.add_route("/repo/dists/focal/Release", release.encode() + b"\n")
+        self.add_route("/repo/dists/focal/Release.gpg", b"signature")
+        # the mirror has not finished updating the index
+        self.add_route(
+            "/repo/dists/focal/main/binary-amd64/Packages.xz",
+            lzma.compress(b"Package: two\n"),
+        )
+
+        # the download is reported as failed, and the old snapshot is kept
+        [changes] = find.RepositoryCrawler(self.make_client(), repo).refresh(store)
+        self.assertEqual(changes.fetched, {"main/binary-amd64/Packages.xz": 502})
+        self.assertEqual(store.load(repo.url.url), {})
+
+
+class TestLinksPage(HttpServerTestCase):
+    def test_links_page(self):
+        # the server lists the items out of name order
+        names = [f"item{i:03}/" for i in reversed(range(250))]
+        items = "".join(f'<a href="{name}">{name}</a>\n' for name in names)
+        html = "<html><head><title>Index of /pool/</title></head><body><pre>"
+        self.add_route(
+            "/pool/",
+            f'{html}<a href="../">../</a>\n{items}</pre></body></html>'.encode(),
+        )
+        client = self.make_client()
+        url = f"{self.base_url}/pool/"
+
+        first = find.get_links_page(client, url, limit=100)
+        self.assertEqual(first.links[0], "item000/")
+        self.assertEqual(first.next_after, "item099/")
+
+        second = find.get_links_page(client, url, after=first.next_after, limit=100)
+        self.assertEqual(second.links[0], "item100/")
+        self.assertEqual(second.next_after, "item199/")
+
+        last = find.get_links_page(client, url, after="item199/", limit=100)
+        self.assertEqual(len(last.links), 50)
+        self.assertIsNone(last.next_after)
+
+        # the listing was downloaded once, and the other pages used the cache
+        self.assertEqual(len(self.handler.requests), 1)
@@ -0,0 +1,54 @@
+import unittest
+
+from intrigue.apt import find, landmark
+from intrigue.apt.landmark import KnownItem
+from intrigue.apt.operations import parse_repository
+
+
+class TestLandmarkIndex(unittest.TestCase):
+    def setUp(self):
+        self.base = "https://deb.example.com/debian"
+        repo = parse_repository(
+            url=self.base,
+            distribution="bookworm",
+            component="main contrib",
+            architecture="amd64 arm64",
+        )
+        self.landmarks = find.detect_landmarks(repo)
+
+    def test_match(self):
+        index = landmark.LandmarkIndex(self.landmarks)
+        dists = f"{self.base}/dists/bookworm"
+
+        self.assertEqual(
+            index.match(f"{dists}/InRelease").name, KnownItem.RELEASE_COMBINED
+        )
+        self.assertEqual(index.match(f"{dists}/by-hash/").name, KnownItem.BY_HASH)
+        self.assertEqual(
+            index.match("https://DEB.example.com/debian/dists/bookworm/Release").name,
+            KnownItem.RELEASE_CLEAR,
+        )
+        self.assertIsNone(index.match(f"{dists}/README"))
+
+    def test_compressed(self):
+        index = landmark.LandmarkIndex(self.landmarks)
+        packages = f"{self.base}/dists/bookworm/main/binary-arm64/Packages"
+
+        for url in [packages, f"{packages}.xz", f"{packages}.gz"]:
+            with self.subTest(url=url):
+                self.assertEqual(index.match(url).name, KnownItem.PACKAGES)
+                self.assertTrue(index.match(url).match(url))
+        self.assertIsNone(index.match(f"{packages}.diff"))
+
+    def test_match_landmarks(self):
+        dists = f"{self.base}/dists/bookworm"
+        urls = [f"{dists}/InRelease", f"{dists}/Contents-amd64.gz", f"{dists}/other"]
+
+        found = find.match_landmarks(self.landmarks, urls)
+        self.assertEqual(
+            [(url, item.name) for url, item in found],
+            [
+                (f"{dists}/InRelease", KnownItem.RELEASE_COMBINED),
+                (f"{dists}/Contents-amd64.gz", KnownItem.CONTENTS),
+            ],
+        )
@@ -1,12 +1,73 @@
 import unittest
 
-from intrigue.apt.models import RepositorySourceEntry
-from intrigue.apt.operations import parse_repository
+from intrigue.apt.models import FileHashType, FileInfo, RepositorySourceEntry
+from intrigue.apt.operations import paragraph, parse_repository, release
 from intrigue.apt.resource import AptRepoKnownNames
 from intrigue.apt.utils import SimpleUrl
 
 
 class TestAptOperations(unittest.TestCase):
+    def test_release_files(self):
+        md5 = "0f1f3e3b8bbb9b0a3a7ba49f0bc1e3c1"
+        sha256 = "1e0ee3b5b2b8fc7c8e7b9d8f6c6a8c6e1e0ee3b5b2b8fc7c8e7b9d8f6c6a8c6e"
+        sha512 = sha256 * 2
+        item = release(
+            "https://deb.example.com/debian/dists/bookworm/Release",
+            "Origin: Debian\nLabel: Debian\nDate: Sat, 10 Jun 2023 08:55:48 UTC\n"
+            "Architectures: amd64\nComponents: main\n"
+            f"MD5Sum:\n {md5} 1024 main/binary-amd64/Packages\n"
+            f" {md5} 10 main/old\n"
+            f"SHA256:\n {sha256} 1024 main/binary-amd64/Packages\n"
+            f" {sha256} 256 main/binary-amd64/Packages.xz\n"
+            f"SHA512:\n {sha512} 256 main/binary-amd64/Packages.xz\n",
+        )
+        self.assertIsNone(item._files)
+        self.assertEqual(
+            item.file_info("main/binary-amd64/Packages.xz"),
+            FileInfo(
+                url_relative="main/binary-amd64/Packages.xz",
+                hash_type=FileHashType.Sha256,
+                hash_value=sha256,
+                size_bytes=256,
+            ),
+        )
+        # other hashes are only used when asked for
+        self.assertEqual(
+            item.file_info("main/binary-amd64/Packages.xz", FileHashType.Sha512),
+            FileInfo(
+                url_relative="main/binary-amd64/Packages.xz",
+                hash_type=FileHashType.Sha512,
+                hash_value=sha512,
+                size_bytes=256,
+            ),
+        )
+        self.assertIsNone(
+            item.file_info("main/binary-amd64/Packages", FileHashType.Sha512)
+        )
+
+        # weaker hashes are not used when the Release file has SHA256 hashes
+        self.assertEqual(
+            sorted(item.files),
+            ["main/binary-amd64/Packages", "main/binary-amd64/Packages.xz"],
+        )
+        self.assertIsNone(item.file_info("main/old"))
+        self.assertEqual(
+            [(i.hash_type, i.url_relative) for i in item.hashes][:2],
+            [
+                (FileHashType.Md5, "main/binary-amd64/Packages"),
+                (FileHashType.Md5, "main/old"),
+            ],
+        )
+
+    def test_paragraph_field_lookup(self):
+        item = paragraph("Package: one\nVERSION: 1.0\nDepends: two,\n three\n")
+        self.assertEqual(
+            [field.name for field in item.fields], ["Package", "VERSION", "Depends"]
+        )
+        self.assertEqual(item.get_field_value("Version").values, ["1.0"])
+        self.assertEqual(item.get_field_value("depends").values, ["two,", "three"])
+        self.assertIsNone(item.get_field_value("Section"))
+
     def test_parse_repository_invalid(self):
         # empty
         self.assertRaisesRegex(
@@ -0,0 +1,65 @@
+import unittest
+
+from intrigue.apt.packages import BinaryPackage, PackageTable
+
+PACKAGES = b"""Package: hello
+Architecture: amd64
+Version: 2.10-3
+Priority: optional
+Section: devel
+Maintainer: Example <hello@example.com>
+Installed-Size: 280
+Depends: libc6 (>= 2.34),
+ libfoo
+Filename: pool/main/h/hello/hello_2.10-3_amd64.deb
+Size: 53022
+SHA256: 0123456789abcdef0123456789abcdef0123456789abcdef0123456789abcdef
+Description: example package based on GNU hello
+ The GNU hello program produces a familiar, friendly greeting.
+
+Package: hello
+Architecture: i386
+Version: 2.10-3
+Section: devel
+Filename: pool/main/h/hello/hello_2.10-3_i386.deb
+Size: 53100
+
+Version: 1.0
+"""
+
+
+class TestPackageTable(unittest.TestCase):
+    def test_load(self):
+        table = PackageTable.from_source(PACKAGES)
+        self.assertEqual(len(table), 2)
+        self.assertEqual(
+            table.row(0),
+            BinaryPackage(
+                name="hello",
+                version="2.10-3",
+                architecture="amd64",
+                filename="pool/main/h/hello/hello_2.10-3_amd64.deb",
+                size_bytes=53022,
+                sha256="0123456789abcdef0123456789abcdef0123456789abcdef0123456789abcdef",
+                installed_size_kib=280,
+                section="devel",
+                priority="optional",
+                maintainer="Example <hello@example.com>",
+                depends="libc6 (>= 2.34), libfoo",
+                description="example package based on GNU hello",
+            ),
+        )
+
+        second = table.row(-1)
+        self.assertEqual(second.architecture, "i386")
+        self.assertIsNone(second.sha256)
+        self.assertIsNone(second.installed_size_kib)
+        self.assertIsNone(second.depends)
+
+        self.assertEqual(
+            [i.architecture for i in table.lookup("hello")], ["amd64", "i386"]
+        )
+        self.assertEqual(table.lookup("missing"), [])
+        self.assertEqual(list(table), [table.row(0), table.row(1)])
+        with self.assertRaises(IndexError):
+            table.row(2)
@@ -0,0 +1,59 @@
+import datetime
+import pathlib
+import tempfile
+import unittest
+
+from intrigue.apt.models import FileHashType, FileInfo
+from intrigue.apt.snapshot import DistSnapshot, SnapshotStore
+
+
+def _file(path: str, hash_value: str) -> FileInfo:
+    return FileInfo(
+        url_relative=path,
+        hash_type=FileHashType.Sha256,
+        hash_value=hash_value * 64,
+        size_bytes=10,
+    )
+
+
+class TestSnapshotStore(unittest.TestCase):
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.store = SnapshotStore(pathlib.Path(self.temp_dir.name) / "snap.sqlite3")
+        self.repo_url = "https://deb.example.com/debian"
+        self.date = datetime.datetime(2024, 6, 10, 2, 31, tzinfo=datetime.UTC)
+
+    def tearDown(self):
+        self.temp_dir.cleanup()
+
+    def test_round_trip(self):
+        first = DistSnapshot(
+            dist="bookworm",
+            date=self.date,
+            valid_until=None,
+            acquire_by_hash=True,
+            files={i.url_relative: i for i in [_file("a", "1"), _file("b", "2")]},
+        )
+        self.store.save(self.repo_url, first)
+        self.assertEqual(self.store.load(self.repo_url), {"bookworm": first})
+        self.assertEqual(self.store.load("https://other.example.com"), {})
+
+        second = DistSnapshot(
+            dist="bookworm",
+            date=self.date + datetime.timedelta(days=1),
+            valid_until=self.date + datetime.timedelta(days=7),
+            acquire_by_hash=True,
+            files={i.url_relative: i for i in [_file("b", "3"), _file("c", "4")]},
+        )
+        self.assertEqual(second.changed_files(first), ["b", "c"])
+        self.assertEqual(second.removed_files(first), ["a"])
+        self.assertFalse(second.is_same_release(first))
+
+        self.store.save(self.repo_url, second, first)
+        self.assertEqual(self.store.load(self.repo_url), {"bookworm": second})
+
+    def test_no_date(self):
+        item = DistSnapshot(
+            dist="sid", date=None, valid_until=None, acquire_by_hash=False
+        )
+        self.assertFalse(item.is_same_release(item))
@@ -0,0 +1,87 @@
+import datetime
+import io
+import unittest
+
+from intrigue.apt.tree_index import TreeEntry, TreeIndex, TreeIndexMemo
+
+LS_LR = """.:
+total 12
+drwxr-sr-x  4 1176 1176 4096 Jun 10 02:31 dists
+drwxr-sr-x  3 1176 1176 4096 Jun 10  2021 pool
+-rw-r--r--  1 1176 1176 1290 Jun 10 02:31 README
+lrwxrwxrwx  1 1176 1176    8 Jun 10 02:31 stable -> bookworm
+
+./dists:
+total 8
+drwxr-sr-x  3 1176 1176 4096 Jun 10 02:31 bookworm
+crw-rw-rw-  1 root root 1, 3 Jun 10 02:31 null
+
+./dists/bookworm:
+total 4
+-rw-r--r--  1 1176 1176 151234 Jun 10 02:31 InRelease
+
+./pool:
+total 0
+"""
+
+
+class TestTreeIndex(unittest.TestCase):
+    def test_parse(self):
+        index = TreeIndex.from_lines(LS_LR.splitlines(keepends=True))
+        self.assertEqual(index.directory_count, 4)
+        self.assertEqual(index.links(""), ["README", "dists/", "pool/", "stable"])
+        self.assertEqual(index.links("dists"), ["bookworm/"])
+        self.assertEqual(index.links("/dists/bookworm/"), ["InRelease"])
+        self.assertEqual(index.links("pool"), [])
+        self.assertIsNone(index.links("missing"))
+
+    def test_entries(self):
+        index = TreeIndex.from_lines(LS_LR.splitlines())
+        entries = {i.name: i for i in index.entries(".")}
+        self.assertEqual(
+            entries["stable"],
+            TreeEntry(
+                name="stable",
+                is_dir=False,
+                size_bytes=8,
+                modified="Jun 10 02:31",
+                target="bookworm",
+            ),
+        )
+        self.assertTrue(entries["stable"].is_link)
+        self.assertEqual(entries["pool"].modified, "Jun 10 2021")
+        self.assertEqual(index.entries("dists/bookworm")[0].size_bytes, 151234)
+
+    def test_memo_rebuilds_changed(self):
+        memo = TreeIndexMemo(max_ttl=datetime.timedelta(0))
+        url = "http://deb.example.com/debian/ls-lR.gz"
+        content = [LS_LR.encode()]
+        built = []
+
+        def build(stream):
+            built.append(stream.read())
+            return TreeIndex.from_lines(built[-1].decode().splitlines())
+
+        def get():
+            return memo.get_or_build(url, lambda: io.BytesIO(content[0]), build)
+
+        # an unchanged listing is fetched again, but not built again
+        first = get()
+        self.assertIs(get(), first)
+        self.assertEqual(len(built), 1)
+
+        content[0] = LS_LR.replace("README", "NOTES").encode()
+        self.assertEqual(get().links(""), ["NOTES", "dists/", "pool/", "stable"])
+        self.assertEqual(len(built), 2)
+
+    def test_memo_missing(self):
+        memo = TreeIndexMemo()
+        url = "http://deb.example.com/debian/ls-lR.gz"
+        fetched = []
+
+        def fetch():
+            fetched.append(url)
+
+        self.assertIsNone(memo.get_or_build(url, fetch, TreeIndex.from_lines))
+        self.assertIsNone(memo.get_or_build(url, fetch, TreeIndex.from_lines))
+        self.assertEqual(len(fetched), 1)
@@ -0,0 +1,27 @@
+import hashlib
+import pathlib
+
+from intrigue.tests.http_server import HttpServerTestCase
+
+
+class TestBlobStore(HttpServerTestCase):
+    def test_get_raw_by_hash(self):
+        content = b"Package: example\n"
+        sha256 = hashlib.sha256(content).hexdigest()
+        self.add_route("/mirror-one/Packages", content)
+        self.add_route("/mirror-two/by-hash/SHA256/" + sha256, content)
+        client = self.make_client()
+
+        url_one = f"{self.base_url}/mirror-one/Packages"
+        url_two = f"{self.base_url}/mirror-two/by-hash/SHA256/{sha256}"
+        self.assertEqual(client.get_raw(url_one, sha256=sha256), (200, content))
+        self.assertEqual(client.get_raw(url_two, sha256=sha256), (200, content))
+        self.assertEqual(len(self.handler.requests), 1)
+
+    def test_hash_mismatch(self):
+        self.add_route("/Packages", b"unexpected")
+        client = self.make_client()
+
+        with self.assertRaisesRegex(ValueError, "does not match expected hash"):
+            client.get_raw(f"{self.base_url}/Packages", sha256="0" * 64)
+        self.assertEqual(list(pathlib.Path(self.temp_dir.name).rglob("*.partial")), [])
@@ -0,0 +1,84 @@
+import unittest
+
+from intrigue.apt.utils import AptException
+from intrigue.html_listing import (
+    ListingFormat,
+    ListingMemo,
+    detect_format,
+    parse_links,
+)
+
+APACHE_HTML = """<!DOCTYPE HTML PUBLIC "-//W3C//DTD HTML 3.2 Final//EN">
+<html><head><title>Index of /ubuntu/dists</title></head><body>
+<h1>Index of /ubuntu/dists</h1>
+<table><tr><th><a href="?C=N;O=D">Name</a></th><th><a href="?C=M;O=A">Last modified</a></th></tr>
+<tr><td><a href="/ubuntu/">Parent Directory</a></td></tr>
+<tr><td><a href="jammy/">jammy/</a></td><td>2024-01-01 00:00</td></tr>
+<tr><td><a href="focal/"><b>focal/</b></a></td><td>2024-01-01 00:00</td></tr>
+<tr><td><a href="a%26b/">a&amp;b/</a></td><td>2024-01-01 00:00</td></tr>
+</table>
+<address>Apache/2.4.52 (Ubuntu) Server at archive.ubuntu.com Port 80</address>
+</body></html>"""
+
+NGINX_HTML = """<html>
+<head><title>Index of /debian/pool/</title></head>
+<body>
+<h1>Index of /debian/pool/</h1><hr><pre><a href="../">../</a>
+<a href="main/">main/</a>                                              01-Jan-2024 00:00       -
+<a href='contrib/'>contrib/</a>                                        01-Jan-2024 00:00       -
+<a href="https://other.example.com/">elsewhere</a>
+</pre><hr></body>
+</html>"""
+
+S3_XML = """<?xml version="1.0" encoding="UTF-8"?>
+<ListBucketResult xmlns="http://s3.amazonaws.com/doc/2006-03-01/">
+<Name>bucket</Name><Prefix>repo/dists/</Prefix><Delimiter>/</Delimiter>
+<Contents><Key>repo/dists/README</Key><Size>10</Size></Contents>
+<CommonPrefixes><Prefix>repo/dists/jammy/</Prefix></CommonPrefixes>
+<CommonPrefixes><Prefix>repo/dists/focal/</Prefix></CommonPrefixes>
+</ListBucketResult>"""
+
+UNKNOWN_HTML = """<html><body><p>Files</p>
+<a href="/">home</a>
+<a href="../">Up</a>
+<a href="one.deb">one.deb</a>
+<a href="two.deb"></a>
+</body></html>"""
+
+
+class TestHtmlListing(unittest.TestCase):
+    def test_apache(self):
+        url = "http://archive.example.com/ubuntu/dists/"
+        self.assertEqual(detect_format(APACHE_HTML), ListingFormat.AUTOINDEX)
+        self.assertEqual(parse_links(url, APACHE_HTML), ["a%26b/", "focal/", "jammy/"])
+
+    def test_nginx(self):
+        url = "http://deb.example.com/debian/pool/"
+        self.assertEqual(detect_format(NGINX_HTML), ListingFormat.AUTOINDEX)
+        self.assertEqual(parse_links(url, NGINX_HTML), ["contrib/", "main/"])
+
+    def test_s3(self):
+        url = "https://bucket.example.com/?prefix=repo/dists/&delimiter=/"
+        self.assertEqual(detect_format(S3_XML), ListingFormat.S3)
+        self.assertEqual(parse_links(url, S3_XML), ["README", "focal/", "jammy/"])
+
+    def test_unknown_uses_fallback(self):
+        url = "http://files.example.com/pool/"
+        self.assertEqual(detect_format(UNKNOWN_HTML), ListingFormat.UNKNOWN)
+        self.assertEqual(parse_links(url, UNKNOWN_HTML), ["one.deb", "two.deb"])
+
+    def test_no_parent(self):
+        with self.assertRaises(AptException):
+            parse_links("http://files.example.com/", "<a href='one'>one</a>")
+
+    def test_memo(self):
+        memo = ListingMemo(max_entries=1)
+        url = "http://deb.example.com/debian/pool/"
+
+        links = memo.links(url, NGINX_HTML)
+        links.append("changed/")
+        self.assertEqual(memo.links(url, NGINX_HTML), ["contrib/", "main/"])
+
+        # a page with different content is parsed again
+        changed = NGINX_HTML.replace("contrib/", "non-free/")
+        self.assertEqual(memo.links(url, changed), ["main/", "non-free/"])
@@ -0,0 +1,211 @@
+import concurrent.futures
+import datetime
+import lzma
+import time
+
+import requests_cache
+
+from intrigue.apt.landmark import KnownItem
+from intrigue.http_client import ExpiryPolicy
+from intrigue.tests.http_server import LISTING_HTML, HttpServerTestCase
+from intrigue.utils import open_archive
+
+
+class TestHttpClient(HttpServerTestCase):
+    def test_get_text_cached(self):
+        self.add_route("/dists/", LISTING_HTML)
+        client = self.make_client()
+
+        url = f"{self.base_url}/dists/"
+        self.assertEqual(client.get_text(url), (200, LISTING_HTML.decode()))
+        self.assertEqual(client.get_text(url), (200, LISTING_HTML.decode()))
+        self.assertEqual(len(self.handler.requests), 1)
+
+    def test_revalidate_stale(self):
+        self.add_route("/dists/jammy/InRelease", b"release", headers={"ETag": '"v1"'})
+        policy = ExpiryPolicy(
+            items={KnownItem.RELEASE_COMBINED: datetime.timedelta(seconds=1)}
+        )
+        client = self.make_client(expiry_policy=policy)
+
+        url = f"{self.base_url}/dists/jammy/InRelease"
+        self.assertEqual(client.get_raw(url), (200, b"release"))
+        time.sleep(1.1)
+
+        # the stale response is returned, and revalidated in the background
+        self.assertEqual(client.get_raw(url), (200, b"release"))
+        for _ in range(50):
+            if len(self.handler.requests) > 1:
+                break
+            time.sleep(0.1)
+        self.assertEqual(len(self.handler.requests), 2)
+        self.assertEqual(self.handler.statuses, [200, 304])
+
+    def test_concurrent_requests_coalesced(self):
+        self.add_route("/dists/", LISTING_HTML, delay=0.5)
+        client = self.make_client()
+
+        url = f"{self.base_url}/dists/"
+        with concurrent.futures.ThreadPoolExecutor(max_workers=4) as executor:
+            results = list(executor.map(client.get_text, [url] * 4))
+
+        self.assertEqual(results, [(200, LISTING_HTML.decode())] * 4)
+        self.assertEqual(len(self.handler.requests), 1)
+
+    def test_memory_cache_hits(self):
+        self.add_route("/dists/", LISTING_HTML)
+        client = self.make_client()
+
+        url = f"{self.base_url}/dists/"
+        self.assertEqual(client.get_raw(url), (200, LISTING_HTML))
+        self.assertEqual(client.get_text(url), (200, LISTING_HTML.decode()))
+        self.assertEqual(client.get_text(url), (200, LISTING_HTML.decode()))
+        self.assertEqual(client.memory_stats.hits, 2)
+        self.assertEqual(client.memory_stats.misses, 1)
+
+    def test_get_missing(self):
+        client = self.make_client()
+        self.assertEqual(client.get_raw(f"{self.base_url}/missing"), (404, None))
+
+    def test_get_raw_revalidate(self):
+        self.add_route("/dists/jammy/InRelease", b"release", headers={"ETag": '"v1"'})
+        self.add_route("/dists/focal/InRelease", b"release")
+        client = self.make_client()
+
+        for dist in ["jammy", "focal"]:
+            url = f"{self.base_url}/dists/{dist}/InRelease"
+            self.assertEqual(client.get_raw(url), (200, b"release"))
+            self.assertEqual(client.get_raw(url, revalidate=True), (200, b"release"))
+
+        # a conditional request when there is an ETag, otherwise a new request
+        self.assertEqual(self.handler.statuses, [200, 304, 200, 200])
+
+    def test_head_probes_burst(self):
+        for i in range(8):
+            self.add_route(f"/dists/item{i}", b"item")
+        client = self.make_client(
+            throttle_time=datetime.timedelta(seconds=1), probe_burst=8
+        )
+
+        # HEAD requests have their own budget, so they do not wait for each other
+        start = time.monotonic()
+        for i in range(8):
+            self.assertEqual(client.head(f"{self.base_url}/dists/item{i}"), (200, 4))
+        self.assertLess(time.monotonic() - start, 1)
+
+        # GET requests still wait for the host's budget
+        client.get_raw(f"{self.base_url}/dists/item0")
+        start = time.monotonic()
+        client.get_raw(f"{self.base_url}/dists/item1")
+        self.assertGreater(time.monotonic() - start, 0.5)
+
+    def test_missing_expires_soon(self):
+        client = self.make_client(
+            expiry_policy=ExpiryPolicy(negative=datetime.timedelta(seconds=1))
+        )
+        url = f"{self.base_url}/pool/main/missing.deb"
+        self.assertEqual(client.get_raw(url), (404, None))
+
+        cached = client.session.get(url, only_if_cached=True)
+        remaining = cached.expires - datetime.datetime.now(datetime.UTC)
+        self.assertGreater(remaining, datetime.timedelta(0))
+        self.assertLessEqual(remaining, datetime.timedelta(seconds=1))
+
+    def test_listing_without_slash_expires(self):
+        self.add_route("/pool/main", LISTING_HTML)
+        client = self.make_client(
+            expiry_policy=ExpiryPolicy(listing=datetime.timedelta(minutes=5))
+        )
+        url = f"{self.base_url}/pool/main"
+        self.assertEqual(client.get_text(url), (200, LISTING_HTML.decode()))
+
+        cached = client.session.get(url, only_if_cached=True)
+        remaining = cached.expires - datetime.datetime.now(datetime.UTC)
+        self.assertLessEqual(remaining, datetime.timedelta(minutes=5))
+
+    def test_expiry_policy(self):
+        policy = ExpiryPolicy()
+        base = "https://deb.debian.org/debian"
+        self.assertEqual(
+            policy.expire_after(f"{base}/pool/main/a/apt/apt_2.6.1_amd64.deb"),
+            requests_cache.NEVER_EXPIRE,
+        )
+        self.assertEqual(
+            policy.expire_after(
+                f"{base}/dists/bookworm/main/binary-amd64/by-hash/SHA256/ab"
+            ),
+            requests_cache.NEVER_EXPIRE,
+        )
+        self.assertEqual(
+            policy.expire_after(f"{base}/dists/bookworm/InRelease"),
+            datetime.timedelta(minutes=30),
+        )
+        self.assertEqual(
+            policy.expire_after(f"{base}/dists/bookworm/main/"),
+            datetime.timedelta(hours=6),
+        )
+        self.assertEqual(
+            policy.expire_after(f"{base}/pool/main/a/apt/"),
+            datetime.timedelta(hours=6),
+        )
+        self.assertEqual(
+            policy.expire_after(f"{base}/dists/bookworm/main/binary-amd64/by-hash/"),
+            datetime.timedelta(hours=6),
+        )
+        # directory urls without a trailing slash are listings too
+        for path in [
+            "pool/main",
+            "pool/main/p/python3.11",
+            "dists/bookworm/main/binary-amd64/by-hash",
+            "dists/bookworm/main/binary-amd64/by-hash/SHA256",
+        ]:
+            with self.subTest(path=path):
+                self.assertEqual(
+                    policy.expire_after(f"{base}/{path}"), datetime.timedelta(hours=6)
+                )
+        self.assertEqual(
+            policy.expire_after(f"{base}/pool/main/p/python3.11/python3.11_3.11.2.dsc"),
+            requests_cache.NEVER_EXPIRE,
+        )
+        self.assertEqual(
+            policy.expire_after(f"{base}/dists/bookworm/main/i18n/Translation-en.bz2"),
+            datetime.timedelta(hours=6),
+        )
+        self.assertEqual(
+            policy.expire_after(f"{base}/README.html"), datetime.timedelta(hours=6)
+        )
+
+
+class TestHttpClientStream(HttpServerTestCase):
+    def test_get_stream_spooled(self):
+        content = b"Package: example\n" * 1000
+        self.add_route(
+            "/dists/jammy/main/binary-amd64/Packages.xz", lzma.compress(content)
+        )
+        client = self.make_client(max_in_memory=1024)
+
+        url = f"{self.base_url}/dists/jammy/main/binary-amd64/Packages.xz"
+        status, stream = client.get_stream(url, chunk_size=256)
+        self.assertEqual(status, 200)
+        with stream, open_archive(url, stream) as decompressed:
+            self.assertEqual(decompressed.read(), content)
+
+    def test_get_stream_cached(self):
+        content = b"Package: example\n" * 1000
+        self.add_route("/dists/jammy/main/binary-amd64/Packages", content)
+        client = self.make_client(max_in_memory=1024)
+
+        url = f"{self.base_url}/dists/jammy/main/binary-amd64/Packages"
+        client.session.get(url)
+
+        # the cached body is spooled to disk, and not kept in memory
+        status, stream = client.get_stream(url, chunk_size=256)
+        with stream:
+            self.assertEqual((status, stream.read()), (200, content))
+            self.assertTrue(stream._rolled)
+        self.assertEqual(len(self.handler.requests), 1)
+        self.assertEqual(client.memory_stats.entries, 0)
+
+    def test_get_stream_missing(self):
+        client = self.make_client()
+        self.assertEqual(client.get_stream(f"{self.base_url}/missing"), (404, None))
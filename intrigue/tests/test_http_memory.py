@@ -0,0 +1,36 @@
+import datetime
+import unittest
+
+from intrigue.http_memory import MemoryCache, MemoryCacheEntry
+
+
+class TestMemoryCache(unittest.TestCase):
+    def test_lru_eviction(self):
+        cache = MemoryCache(max_bytes=10, max_ttl=datetime.timedelta(minutes=1))
+        cache.put("one", MemoryCacheEntry(status=200, content=b"12345", encoding=None))
+        cache.put("two", MemoryCacheEntry(status=200, content=b"12345", encoding=None))
+        self.assertIsNotNone(cache.get("one"))
+
+        # 'two' is the least recently used
+        cache.put("three", MemoryCacheEntry(status=200, content=b"123", encoding=None))
+        self.assertIsNone(cache.get("two"))
+        self.assertIsNotNone(cache.get("one"))
+
+        stats = cache.stats()
+        self.assertEqual((stats.hits, stats.misses, stats.evictions), (2, 1, 1))
+        self.assertEqual((stats.entries, stats.size_bytes), (2, 8))
+
+    def test_expired_not_stored(self):
+        cache = MemoryCache(max_bytes=10, max_ttl=datetime.timedelta(minutes=1))
+        expires = datetime.datetime.now(datetime.UTC) - datetime.timedelta(seconds=1)
+        entry = MemoryCacheEntry(status=200, content=b"1", encoding=None)
+        cache.put("one", entry, expires)
+        self.assertIsNone(cache.get("one"))
+
+    def test_with_text(self):
+        content = "Origin: Ubuntu ünïcode".encode()
+        entry = MemoryCacheEntry(status=200, content=content, encoding=None)
+        self.assertEqual(entry.with_text().text, "Origin: Ubuntu ünïcode")
+
+        entry = MemoryCacheEntry(status=200, content=content, encoding="ISO-8859-1")
+        self.assertEqual(entry.with_text().text, content.decode("ISO-8859-1"))
@@ -0,0 +1,104 @@
+import lzma
+import time
+import unittest
+
+import requests
+
+from intrigue.http_storage import BodyCompressionStage, CacheStore
+from intrigue.tests.http_server import HttpServerTestCase
+
+
+class TestCacheStore(HttpServerTestCase):
+    def test_evict_least_recently_used(self):
+        for name in ["one", "two", "three"]:
+            self.add_route(f"/{name}.txt", name.encode() * 100)
+        client = self.make_client(cache_max_bytes=1024 * 1024)
+
+        for name in ["one", "two", "three"]:
+            client.get_raw(f"{self.base_url}/{name}.txt")
+            time.sleep(0.01)
+
+        store = client.cache_store
+        stats = store.stats()
+        self.assertEqual(stats.entries, 3)
+        self.assertEqual(
+            [i.host for i in stats.hosts], [f"127.0.0.1:{self.server.server_port}"]
+        )
+
+        # limit the cache to about two responses
+        limited = CacheStore(client.session.cache, max_bytes=stats.size_bytes - 1)
+        self.assertEqual(limited.evict(), 1)
+        cache = client.session.cache
+        self.assertFalse(cache.contains(url=f"{self.base_url}/one.txt"))
+        self.assertTrue(cache.contains(url=f"{self.base_url}/three.txt"))
+
+    def test_hits_written_in_batches(self):
+        self.add_route("/one.txt", b"one")
+        client = self.make_client(memory_cache_bytes=0)
+        store = CacheStore(client.session.cache, flush_every=3)
+        url = f"{self.base_url}/one.txt"
+        key = client.session.cache.create_key(requests.Request("GET", url))
+
+        def accessed():
+            with client.session.cache.responses.connection() as conn:
+                row = conn.execute(
+                    f"SELECT accessed FROM {store.table_name} WHERE key = ?", (key,)
+                ).fetchone()
+            return row[0]
+
+        client.get_raw(url)
+        stored = accessed()
+
+        # hits are kept in memory until there are enough to write
+        for _ in range(2):
+            store.touch(key, url)
+        self.assertEqual(accessed(), stored)
+        store.touch(key, url)
+        self.assertGreater(accessed(), stored)
+
+    def test_memory_hits_recorded(self):
+        self.add_route("/one.txt", b"one")
+        client = self.make_client()
+        url = f"{self.base_url}/one.txt"
+        key = client.session.cache.create_key(requests.Request("GET", url))
+
+        def accessed():
+            client.cache_store.flush()
+            with client.session.cache.responses.connection() as conn:
+                row = conn.execute(
+                    f"SELECT accessed FROM {client.cache_store.table_name} "
+                    "WHERE key = ?",
+                    (key,),
+                ).fetchone()
+            return row[0]
+
+        client.get_raw(url)
+        stored = accessed()
+        time.sleep(0.01)
+
+        # a hit served from memory still counts as a use of the cached response
+        client.get_raw(url)
+        self.assertEqual(client.memory_stats.hits, 1)
+        self.assertGreater(accessed(), stored)
+
+
+class TestBodyCompression(unittest.TestCase):
+    def test_round_trip(self):
+        stage = BodyCompressionStage(min_bytes=10, large_bytes=1000)
+        small = {"url": "https://example.com/dists/", "_content": b"a" * 100}
+        large = {"url": "https://example.com/dists/", "_content": b"b" * 2000}
+
+        for value, codec in [(small, "zlib"), (large, "lzma")]:
+            dumped = stage.dumps(value)
+            self.assertEqual(dumped[stage.codec_key], codec)
+            self.assertLess(len(dumped["_content"]), len(value["_content"]))
+            self.assertEqual(stage.loads(dumped), value)
+
+    def test_skip_compressed(self):
+        stage = BodyCompressionStage(min_bytes=10)
+        by_name = {"url": "https://example.com/Packages.xz", "_content": b"c" * 100}
+        by_magic = {"url": "https://example.com/file", "_content": lzma.compress(b"d")}
+        small = {"url": "https://example.com/file", "_content": b"e"}
+
+        for value in [by_name, by_magic, small]:
+            self.assertEqual(stage.dumps(value), value)
@@ -0,0 +1,29 @@
+import pathlib
+import tempfile
+import unittest
+
+from intrigue.http_throttle import HostRateLimiter
+
+
+class TestHostRateLimiter(unittest.TestCase):
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.db_file = pathlib.Path(self.temp_dir.name) / "limits.sqlite3"
+
+    def tearDown(self):
+        self.temp_dir.cleanup()
+
+    def test_burst_then_wait(self):
+        limiter = HostRateLimiter(self.db_file, rate=20.0, burst=2)
+        self.assertEqual(limiter.acquire("one.example.com"), 0)
+        self.assertEqual(limiter.acquire("one.example.com"), 0)
+        self.assertGreater(limiter.acquire("one.example.com"), 0)
+
+        # other hosts have their own budget
+        self.assertEqual(limiter.acquire("two.example.com"), 0)
+
+    def test_shared_state(self):
+        first = HostRateLimiter(self.db_file, rate=20.0, burst=1)
+        second = HostRateLimiter(self.db_file, rate=20.0, burst=1)
+        self.assertEqual(first.acquire("one.example.com"), 0)
+        self.assertGreater(second.acquire("one.example.com"), 0)
@@ -1,7 +1,10 @@
 """Utilities for data."""
 
+import contextlib
 import io
 import pathlib
+import sqlite3
+import threading
 import typing
 from datetime import datetime
 from importlib.metadata import PackageNotFoundError, distribution
@@ -156,3 +159,64 @@ def read_archive(
         yield name, bz2.decompress(content)
 
     yield name, content
+
+
+@beartype
+def open_archive(name: str, content: io.IOBase) -> io.IOBase:
+    """Open a file-like object with the given name,
+    decompressing the content as it is read.
+
+    Unlike read_archive, the content is never held in memory all at once."""
+    path_name = pathlib.Path(name)
+    suffixes = set(path_name.suffixes)
+
+    if suffixes.intersection(ARCHIVE_EXTENSIONS["xz"]):
+        import lzma
+
+        return lzma.LZMAFile(content, "rb")
+
+    if suffixes.intersection(ARCHIVE_EXTENSIONS["gz"]):
+        import gzip
+
+        return gzip.GzipFile(fileobj=content, mode="rb")
+
+    if suffixes.intersection(ARCHIVE_EXTENSIONS["bz2"]):
+        import bz2
+
+        return bz2.BZ2File(content, "rb")
+
+    return content
+
+
+@beartype
+class SqliteConnection:
+    """A connection to a sqlite database file for each thread.
+
+    The file can be shared by many threads and processes.
+    Each transaction takes the write lock before reading,
+    so other threads and processes wait their turn."""
+
+    def __init__(self, db_file: pathlib.Path, timeout: float = 30):
+        self._db_file = db_file
+        self._timeout = timeout
+        self._local = threading.local()
+
+    @contextlib.contextmanager
+    def transaction(self) -> typing.Iterator[sqlite3.Connection]:
+        """Run statements in a transaction that commits when the block succeeds,
+        and rolls back when it raises an error."""
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(
+                self._db_file, timeout=self._timeout, isolation_level=None
+            )
+            self._local.conn = conn
+
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            yield conn
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        else:
+            conn.execute("COMMIT")